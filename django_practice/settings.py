@@ -65,6 +65,16 @@ REST_FRAMEWORK = {
     # 'PAGE_SIZE': 2,  # Number of items per page
 }
 
+# Raise instead of logging when a viewset goes over its query budget
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=DEBUG, cast=bool)
+
+# Paginated API responses and the large admin changelists count exactly up
+# to this many rows and use PostgreSQL's planner estimate past it
+# (myapp/pagination.py); empty counts everything exactly
+ESTIMATED_COUNT_THRESHOLD = config(
+    'ESTIMATED_COUNT_THRESHOLD', default=10000, cast=lambda value: int(value) if value else None
+)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -134,6 +144,29 @@ else:
         }
     }
 
+# Caching
+# Use a shared backend (file-based, Memcached or Redis) in production so that
+# cache invalidation reaches every worker process. API response caching and
+# ETag/Last-Modified validators are turned off on the process-local default.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Seconds a cached API response is served before it is recomputed
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Open Library client, see myapp/openlibrary.py for every option
+
+OPEN_LIBRARY = {
+    'CONNECT_TIMEOUT': config('OPEN_LIBRARY_CONNECT_TIMEOUT', default=3.05, cast=float),
+    'READ_TIMEOUT': config('OPEN_LIBRARY_READ_TIMEOUT', default=10, cast=float),
+    'CACHE_TTL': config('OPEN_LIBRARY_CACHE_TTL', default=24 * 60 * 60, cast=int),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -159,6 +192,29 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Directory to store media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Directory to store media files
 
+# Media is served by myapp.media.serve_media. Content-hashed files are cached
+# forever, others for MEDIA_MAX_AGE seconds. Set MEDIA_ACCEL_REDIRECT to an
+# nginx internal location (e.g. /protected-media/) to let nginx send files.
+MEDIA_MAX_AGE = config('MEDIA_MAX_AGE', default=60 * 60, cast=int)
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default='')
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # Book covers and their renditions, deduplicated and sharded by content hash
+    'covers': {'BACKEND': 'myapp.storage.ContentAddressedStorage'},
+}
+
+# Processes resizing cover photos (myapp/renditions.py), defaults to one per CPU
+RENDITION_WORKERS = config('RENDITION_WORKERS', default=None, cast=lambda value: int(value) if value else None)
+
+# Book ratings are ranked by a Bayesian score (myapp/ratings.py): every book
+# counts RATING_PRIOR_WEIGHT extra reviews of RATING_PRIOR_MEAN stars, so a
+# couple of 5-star reviews do not outrank hundreds of good ones. Run
+# `manage.py reconcile_ratings` after changing them.
+RATING_PRIOR_WEIGHT = config('RATING_PRIOR_WEIGHT', default=10, cast=int)
+RATING_PRIOR_MEAN = config('RATING_PRIOR_MEAN', default=3.0, cast=float)
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -1,7 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Prefetch
+from .enrichment import enrich_descriptions
+from .exports import export_action
 from .models import Book, Review, Publisher, Author, Genre, BookGenre,OrderItem, Order
 from django.utils.timezone import now
-from .filters import CustomDateFilter, PriceRangeFilter
+from .filters import CustomDateFilter, PriceRangeFilter, published_in
+from .openlibrary import OpenLibraryUnavailable
+from .pagination import EstimatedCountPaginator
 
 
 class ReviewInline(admin.TabularInline):
@@ -11,8 +16,13 @@ class ReviewInline(admin.TabularInline):
     model = Review
     extra = 1
     fields = ('user', 'review_text', 'rating')
+    autocomplete_fields = ('user',)
     max_num = 5
 
+    def get_queryset(self, request):
+        # Rows are labelled with their __str__
+        return super().get_queryset(request).select_related('book', 'user')
+
 class BookGenreInline(admin.TabularInline):
     """
     Inline display for genres associated with a book.
@@ -22,6 +32,9 @@ class BookGenreInline(admin.TabularInline):
     fields = ('genre', 'created_at')
     readonly_fields = ('created_at',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('books', 'genre')
+
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     """
@@ -29,25 +42,54 @@ class BookAdmin(admin.ModelAdmin):
     """
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.filter(published_date__year=now().year)
+        if request.resolver_match and request.resolver_match.url_name == 'autocomplete':
+            # Book pickers on other models search the whole catalogue
+            return queryset.only('id', 'title')
+        return queryset.filter(published_in(now().year)).prefetch_related(
+            Prefetch('authors', queryset=Author.objects.only('id', 'first_name', 'last_name'))
+        )
 
     list_display = ('title', 'get_authors', 'publisher', 'published_date', 'price')
+    list_select_related = ('publisher',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     search_fields = ('title', 'publisher__name', 'authors__first_name', 'authors__last_name')
     list_filter = (CustomDateFilter, PriceRangeFilter, 'publisher')
     inlines = [ReviewInline, BookGenreInline]
+    actions = ['enrich_descriptions', export_action('books', 'csv'), export_action('books', 'ndjson', compress=True)]
 
     def get_authors(self, obj):
         return ", ".join([author.first_name + " " + author.last_name for author in obj.authors.all()])
     get_authors.short_description = 'Authors'
 
+    @admin.action(description="Fetch descriptions from Open Library")
+    def enrich_descriptions(self, request, queryset):
+        # Large backfills belong in `manage.py enrich_descriptions`.
+        try:
+            progress = enrich_descriptions(queryset)
+        except OpenLibraryUnavailable as e:
+            self.message_user(request, f"Open Library is unavailable: {e}", messages.ERROR)
+            return
+        self.message_user(
+            request,
+            f"Updated {progress.updated} of {progress.processed} books "
+            f"({progress.missing} without a match, {progress.failed} failed).",
+            messages.WARNING if progress.failed else messages.SUCCESS,
+        )
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     """
     Admin customization for the Review model.
     """
     list_display = ('book','user', 'review_text', 'rating', 'created_at')
+    list_select_related = ('book', 'user')
     search_fields = ('book__title', 'review_text')
     list_filter = ('rating', 'created_at')
+    autocomplete_fields = ('book', 'user')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = [export_action('reviews', 'csv'), export_action('reviews', 'ndjson', compress=True)]
 
 
 @admin.register(Publisher)
@@ -68,6 +110,11 @@ class AuthorAdmin(admin.ModelAdmin):
     search_fields = ('first_name', 'last_name', 'books__title')
     list_filter = ('nationality',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('books', queryset=Book.objects.only('id', 'title'))
+        )
+
     def get_books(self, obj):
         return ", ".join([book.title for book in obj.books.all()])
     get_books.short_description = 'Books'
@@ -89,27 +136,42 @@ class BookGenreAdmin(admin.ModelAdmin):
     Admin customization for the BookGenre intermediary model.
     """
     list_display = ('books', 'genre', 'created_at')
+    list_select_related = ('books', 'genre')
     list_filter = ('genre', 'created_at')
-    search_fields = ('book__title', 'genre__name')
+    search_fields = ('books__title', 'genre__name')
+    autocomplete_fields = ('books',)
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem  # The through model
     extra = 1  # Number of empty forms displayed by default
     fields = ('book', 'quantity')  # Fields to display in the inline form
+    autocomplete_fields = ('book',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('book', 'order')
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     
     list_display = ('user', 'total_price','status','ordered_date')
-    list_filter = ('user', 'ordered_date')
-    search_fields = ('total_price', 'status','books')
+    list_select_related = ('user',)
+    # Filtering by user is a search, a sidebar of every user is not
+    list_filter = ('status', 'ordered_date')
+    search_fields = ('=id', 'user__username', 'user__email')
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     inlines = [OrderItemInline]  # Include the inline for OrderItem
+    actions = [export_action('orders', 'csv'), export_action('orders', 'ndjson', compress=True)]
 
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'book', 'quantity')
-    list_filter = ('order', 'book')
+    list_select_related = ('order__user', 'book')
     search_fields = ('order__user__username', 'book__title')
+    autocomplete_fields = ('order', 'book')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
@@ -0,0 +1,64 @@
+from django.db import transaction
+from .cache import bump_versions
+from .models import Author, Book, BookGenre, Genre, Publisher
+from .search import refresh_documents
+
+
+def existing_ids(items):
+    """
+    Load, in one query per model, which of the publisher, author and genre
+    ids referenced by `items` exist.
+    """
+    def referenced(key):
+        ids = set()
+        for item in items:
+            value = item.get(key) if isinstance(item, dict) else None
+            for pk in value if isinstance(value, list) else [value]:
+                if isinstance(pk, int) or (isinstance(pk, str) and pk.isdigit()):
+                    ids.add(int(pk))
+        return ids
+
+    return {
+        'publisher_ids': set(Publisher.objects.filter(pk__in=referenced('publisher')).values_list('pk', flat=True)),
+        'author_ids': set(Author.objects.filter(pk__in=referenced('authors')).values_list('pk', flat=True)),
+        'genre_ids': set(Genre.objects.filter(pk__in=referenced('genres')).values_list('pk', flat=True)),
+    }
+
+
+def create_books(rows, batch_size=500):
+    """
+    Create books from validated rows (book fields plus `publisher`,
+    `authors` and `genres` ids) with one bulk insert per table, in a single
+    transaction. Returns the created books, in order.
+
+    bulk_create sends no signals, so the search documents and cache
+    versions are refreshed here.
+    """
+    with transaction.atomic():
+        books = Book.objects.bulk_create(
+            [
+                Book(
+                    publisher_id=row['publisher'],
+                    **{key: value for key, value in row.items() if key not in ('publisher', 'authors', 'genres')},
+                )
+                for row in rows
+            ],
+            batch_size=batch_size,
+        )
+        Book.authors.through.objects.bulk_create(
+            [
+                Book.authors.through(book_id=book.pk, author_id=author_id)
+                for book, row in zip(books, rows) for author_id in row.get('authors', ())
+            ],
+            batch_size=batch_size,
+        )
+        BookGenre.objects.bulk_create(
+            [
+                BookGenre(books_id=book.pk, genre_id=genre_id)
+                for book, row in zip(books, rows) for genre_id in row.get('genres', ())
+            ],
+            batch_size=batch_size,
+        )
+        refresh_documents([book.pk for book in books], batch_size=batch_size)
+        bump_versions(Book, Book.authors.through, BookGenre)
+    return books
@@ -0,0 +1,213 @@
+import time
+import weakref
+import hashlib
+import threading
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+VERSION_KEY_PREFIX = 'model-version:'
+MODIFIED_KEY_PREFIX = 'model-modified:'
+RESPONSE_KEY_PREFIX = 'response:'
+
+# Backends whose entries are only seen by the process that wrote them
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+_recompute_locks = weakref.WeakValueDictionary()
+_recompute_locks_guard = threading.Lock()
+
+
+def recompute_lock(key):
+    """
+    In-process lock for a cache key. cache.add() is not atomic on every
+    backend (the file-based one checks then writes), so threads of one
+    process coalesce on this first.
+    """
+    with _recompute_locks_guard:
+        lock = _recompute_locks.get(key)
+        if lock is None:
+            lock = _recompute_locks[key] = threading.Lock()
+        return lock
+
+
+def versions_are_shared():
+    """
+    Whether the version counters live in a cache every worker shares.
+
+    With a process-local backend a write on one worker leaves the counters
+    of the others untouched, so their cached responses and validators
+    would go on describing stale data. Callers skip caching then.
+    """
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_BACKENDS)
+
+
+def version_key(model):
+    return VERSION_KEY_PREFIX + model._meta.label_lower
+
+
+def initial_version():
+    # Seeded from the clock rather than 1, so a counter that was evicted
+    # never restarts at a number that is still part of a live cache key.
+    return time.time_ns() // 1000
+
+
+def get_versions(models):
+    """
+    Return the current version counter of each model, as a list in the
+    order given.
+    """
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        with _recompute_locks_guard:
+            now = time.time()
+            for key in missing:
+                cache.add(key, initial_version(), timeout=None)
+                # The real change time is unknown, "now" is a safe upper bound.
+                cache.add(MODIFIED_KEY_PREFIX + key[len(VERSION_KEY_PREFIX):], now, timeout=None)
+            versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_versions(*models):
+    """
+    Invalidate every cached response that depends on one of the models and
+    record when they last changed.
+
+    Inside a transaction the counters are bumped again on commit. Until
+    then concurrent requests still read the old rows, and may cache them
+    (or hand out ETags for them) under the version taken by the first bump.
+    """
+    _bump(models)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(models))
+
+
+def _bump(models):
+    for model in models:
+        key = version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_version(), timeout=None)
+    now = time.time()
+    cache.set_many({MODIFIED_KEY_PREFIX + model._meta.label_lower: now for model in models}, timeout=None)
+
+
+def get_last_modified(models):
+    """
+    Return the most recent time, as a timestamp, at which one of the models
+    changed, or None when it is not known.
+    """
+    keys = [MODIFIED_KEY_PREFIX + model._meta.label_lower for model in models]
+    times = cache.get_many(keys)
+    if not keys or len(times) < len(keys):
+        return None
+    return max(times.values())
+
+
+def normalise_query(query_params):
+    return urlencode(sorted((key, value) for key, values in query_params.lists() for value in values))
+
+
+class CachedResponseMixin:
+    """
+    Caches successful list and retrieve responses of a viewset.
+
+    Keys combine the action, URL kwargs, normalised query string and the
+    version counters of `cache_dependencies`; signals bump those counters
+    when the models change, so stale entries are simply never read again.
+    Nothing is cached unless the default cache is shared between workers.
+
+    Entries are kept for a grace period after they go stale. While one
+    request holds the recompute lock, concurrent requests are served the
+    stale entry, or wait briefly for the new one on a cold key, so only one
+    worker hits the database per key.
+    """
+    cache_dependencies = ()
+    cache_lock_timeout = 10
+    cache_wait_timeout = 2
+    cache_poll_interval = 0.05
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_signature(self, request):
+        """
+        The part of the request the response depends on, normalised.
+        """
+        return normalise_query(request.query_params)
+
+    def get_response_cache_key(self, request, *args, **kwargs):
+        versions = get_versions(self.cache_dependencies)
+        parts = [
+            # Payloads hold absolute URLs (pagination links)
+            request.scheme,
+            request.get_host(),
+            self.basename,
+            self.action,
+            urlencode(sorted(kwargs.items())),
+            self.get_cache_signature(request),
+            ".".join(str(version) for version in versions),
+        ]
+        digest = hashlib.sha256("|".join(parts).encode()).hexdigest()
+        return RESPONSE_KEY_PREFIX + digest
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+        if not timeout or not versions_are_shared():
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request, *args, **kwargs)
+        entry = cache.get(key)
+        if entry is not None and entry['expires'] > time.time():
+            return self.response_from_cache(entry, 'HIT')
+
+        lock_key = key + ':lock'
+        local_lock = recompute_lock(key)
+        if local_lock.acquire(blocking=False):
+            try:
+                if cache.add(lock_key, 1, timeout=self.cache_lock_timeout):
+                    try:
+                        # Another request may have refilled the entry
+                        # between our read and taking the lock.
+                        latest = cache.get(key)
+                        if latest is not None and latest['expires'] > time.time():
+                            return self.response_from_cache(latest, 'HIT')
+                        response = handler(request, *args, **kwargs)
+                        if response.status_code == 200:
+                            cache.set(key, {
+                                'data': response.data,
+                                'status': response.status_code,
+                                'expires': time.time() + timeout,
+                            }, timeout=timeout * 2)
+                        response['X-Cache'] = 'MISS'
+                        return response
+                    finally:
+                        cache.delete(lock_key)
+            finally:
+                local_lock.release()
+
+        if entry is not None:
+            return self.response_from_cache(entry, 'STALE')
+
+        deadline = time.time() + self.cache_wait_timeout
+        while time.time() < deadline:
+            time.sleep(self.cache_poll_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return self.response_from_cache(entry, 'HIT')
+        return handler(request, *args, **kwargs)
+
+    def response_from_cache(self, entry, state):
+        response = Response(entry['data'], status=entry['status'])
+        response['X-Cache'] = state
+        return response
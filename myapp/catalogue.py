@@ -0,0 +1,264 @@
+"""
+Bulk catalogue import: streams CSV or NDJSON files of publishers, authors,
+genres and books into the database.
+
+Related objects are referenced by name (publisher and genre name, author
+"First Last") and resolved against in-memory maps of the existing rows, so
+no row needs a lookup query. On PostgreSQL rows are loaded with COPY into
+ids reserved from the table's sequence up front, elsewhere with batched
+bulk_create.
+"""
+import io
+import csv
+import gzip
+import json
+import time
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from .cache import bump_versions
+from .models import Author, Book, BookGenre, Genre, Publisher
+from .search import refresh_documents
+
+LIST_SEPARATOR = ';'
+
+
+def read_rows(path, format=None):
+    """
+    Yield (line number, dict) for each record of a CSV or NDJSON file,
+    optionally gzipped. The format defaults to the file extension.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    format = format or ('csv' if name.endswith('.csv') else 'ndjson')
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if format == 'csv':
+            # line 1 is the header
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+def split_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR)
+    return [item.strip() for item in value if item and item.strip()]
+
+
+def author_key(first_name, last_name):
+    return f"{first_name} {last_name}".strip().casefold()
+
+
+class RowError(Exception):
+    pass
+
+
+class Loader:
+    """
+    Inserts model instances in bulk: COPY on PostgreSQL, bulk_create
+    otherwise. Either way the instances have their pk set afterwards.
+    """
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def load(self, model, objects):
+        if not objects:
+            return objects
+        if not self.use_copy:
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+        fields = model._meta.concrete_fields
+        for obj, pk in zip(objects, self.reserve_ids(model, len(objects))):
+            obj.pk = pk
+        buffer = io.StringIO()
+        for obj in objects:
+            values = []
+            for field in fields:
+                field.pre_save(obj, add=True)  # fills auto_now(_add) fields
+                values.append(self.to_text(field, obj))
+            buffer.write(",".join(self.quote(value) for value in values) + "\n")
+        buffer.seek(0)
+
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        return objects
+
+    def reserve_ids(self, model, count):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                [model._meta.db_table, model._meta.pk.column, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def to_text(field, obj):
+        value = field.value_from_object(obj)
+        if value is None:
+            return None
+        if field.get_internal_type() == 'JSONField':
+            return json.dumps(value)
+        return field.value_to_string(obj)
+
+    @staticmethod
+    def quote(value):
+        # Unquoted empty is NULL in COPY's CSV format, quoted "" is ''.
+        if value is None:
+            return ''
+        return '"' + value.replace('"', '""') + '"'
+
+
+class CatalogueImporter:
+    """
+    Imports catalogue files batch by batch, each batch in its own
+    transaction. Rows that cannot be imported are counted and the first
+    `max_errors` of them are kept in `errors`.
+    """
+    def __init__(self, batch_size=5000, index=True, max_errors=20, on_progress=None):
+        self.batch_size = batch_size
+        self.index = index
+        self.max_errors = max_errors
+        self.on_progress = on_progress
+        self.loader = Loader(batch_size)
+        self.errors = []
+        self.error_count = 0
+        self.publishers = dict(Publisher.objects.values_list('name', 'pk'))
+        self.genres = {name.casefold(): pk for name, pk in Genre.objects.values_list('name', 'pk')}
+        # Author names are not unique; descending pks leave the oldest mapped.
+        self.authors = {}
+        for pk, first_name, last_name in Author.objects.order_by('-pk').values_list('pk', 'first_name', 'last_name'):
+            self.authors[author_key(first_name, last_name)] = pk
+
+    def import_publishers(self, rows):
+        def build(row):
+            if row.get('name') in self.publishers:
+                return None
+            publisher = self.build(Publisher, row, ('name', 'location', 'established_year', 'website', 'contact_email'))
+            self.publishers[publisher.name] = None  # filled in once loaded
+            return publisher
+
+        def loaded(publishers):
+            self.publishers.update((publisher.name, publisher.pk) for publisher in publishers)
+
+        return self.run('publishers', rows, build, loaded)
+
+    def import_authors(self, rows):
+        def build(row):
+            if author_key(row.get('first_name', ''), row.get('last_name', '')) in self.authors:
+                return None
+            author = self.build(Author, row, ('first_name', 'last_name', 'nationality'))
+            self.authors[author_key(author.first_name, author.last_name)] = None
+            return author
+
+        def loaded(authors):
+            self.authors.update((author_key(author.first_name, author.last_name), author.pk) for author in authors)
+
+        return self.run('authors', rows, build, loaded)
+
+    def import_genres(self, rows):
+        def build(row):
+            if (row.get('name') or '').casefold() in self.genres:
+                return None
+            genre = self.build(Genre, row, ('name', 'description'))
+            self.genres[genre.name.casefold()] = None
+            return genre
+
+        def loaded(genres):
+            self.genres.update((genre.name.casefold(), genre.pk) for genre in genres)
+
+        return self.run('genres', rows, build, loaded)
+
+    def import_books(self, rows):
+        def build(row):
+            book = self.build(Book, row, ('title', 'published_date', 'price', 'stock_quantity', 'description'))
+            book.publisher_id = self.resolve(self.publishers, row.get('publisher'), "publisher")
+            book._author_ids = [self.resolve(self.authors, author_key(name, ''), "author") for name in split_list(row.get('authors'))]
+            book._genre_ids = [self.resolve(self.genres, name.casefold(), "genre") for name in split_list(row.get('genres'))]
+            return book
+
+        def loaded(books):
+            self.loader.load(Book.authors.through, [
+                Book.authors.through(book_id=book.pk, author_id=author_id)
+                for book in books for author_id in dict.fromkeys(book._author_ids)
+            ])
+            self.loader.load(BookGenre, [
+                BookGenre(books_id=book.pk, genre_id=genre_id)
+                for book in books for genre_id in dict.fromkeys(book._genre_ids)
+            ])
+            if self.index:
+                refresh_documents([book.pk for book in books], batch_size=self.batch_size)
+
+        return self.run('books', rows, build, loaded)
+
+    def build(self, model, row, names):
+        obj = model()
+        for name in names:
+            field = model._meta.get_field(name)
+            raw = row.get(name)
+            if raw in (None, '') and field.has_default():
+                continue
+            if raw is None:
+                raw = '' if not field.null else None
+            try:
+                setattr(obj, field.attname, field.clean(raw, obj))
+            except ValidationError as e:
+                raise RowError(f"{name}: {'; '.join(e.messages)}")
+        return obj
+
+    def resolve(self, lookup, name, label):
+        try:
+            return lookup[name]
+        except KeyError:
+            raise RowError(f"Unknown {label} {name!r}.")
+
+    def run(self, label, rows, build, loaded):
+        """
+        Build objects from `rows`, then load and hand them to `loaded`
+        `batch_size` at a time. Returns the number of rows imported.
+        """
+        started = time.monotonic()
+        imported = 0
+        batch = []
+        for line, row in rows:
+            try:
+                obj = build(row)
+            except RowError as e:
+                self.error(label, line, str(e))
+                continue
+            if obj is not None:
+                batch.append(obj)
+            if len(batch) >= self.batch_size:
+                imported += self.flush(batch, loaded)
+                batch = []
+                self.progress(label, imported, started)
+        if batch:
+            imported += self.flush(batch, loaded)
+        self.progress(label, imported, started)
+        return imported
+
+    def flush(self, batch, loaded):
+        model = type(batch[0])
+        with transaction.atomic():
+            self.loader.load(model, batch)
+            loaded(batch)
+        bump_versions(model, *(() if model is not Book else (Book.authors.through, BookGenre)))
+        return len(batch)
+
+    def error(self, label, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"{label} line {line}: {message}")
+
+    def progress(self, label, imported, started):
+        if self.on_progress:
+            elapsed = time.monotonic() - started
+            self.on_progress(label, imported, imported / elapsed if elapsed else 0)
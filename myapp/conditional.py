@@ -0,0 +1,95 @@
+import hashlib
+from urllib.parse import urlencode
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from .cache import get_last_modified, get_versions, normalise_query, versions_are_shared
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified support for list and retrieve.
+
+    The ETag is derived from the version counters of `cache_dependencies`
+    (see myapp/cache.py), the request URL and the requesting user, so it is
+    known before the view touches the database. A matching If-None-Match,
+    or an If-Modified-Since that is not older than the last change, is
+    answered with 304 Not Modified and no serialization at all.
+
+    Last-Modified comes from the object's `updated_at` for retrieve, when
+    the model has one, and from the last recorded change of the
+    dependencies otherwise.
+
+    Nothing is validated unless the default cache is shared between
+    workers: with per-process counters a write on one worker would leave
+    the validators of the others unchanged, answering 304 for stale data.
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request, *args, **kwargs):
+        versions = get_versions(self.cache_dependencies)
+        parts = [
+            self.basename,
+            self.action,
+            urlencode(sorted(kwargs.items())),
+            normalise_query(request.query_params),
+            request.accepted_media_type or '',
+            str(request.user.pk),
+            ".".join(str(version) for version in versions),
+        ]
+        return '"%s"' % hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+    def get_last_modified(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        if self.action != 'retrieve' or not any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            return get_last_modified(self.cache_dependencies)
+
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        updated_at = model.objects.filter(**lookup).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        # Related rows (authors, items...) do not touch updated_at.
+        related = [dependency for dependency in self.cache_dependencies if dependency is not model]
+        if not related:
+            return updated_at.timestamp()
+        related_modified = get_last_modified(related)
+        if related_modified is None:
+            return None
+        return max(updated_at.timestamp(), related_modified)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if not versions_are_shared():
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(request, *args, **kwargs)
+        last_modified = self.get_last_modified(request, *args, **kwargs)
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # Per RFC 9110, If-Modified-Since is ignored when If-None-Match is sent.
+            etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(if_none_match)]
+            # "*" is not honoured: it would need to know whether the
+            # object exists, which costs the query we are trying to skip.
+            return etag in etags
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if if_modified_since is not None and last_modified is not None:
+            return int(last_modified) <= if_modified_since
+        return False
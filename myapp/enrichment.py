@@ -0,0 +1,115 @@
+import os
+import json
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from django.utils import timezone
+from .cache import bump_versions
+from .models import Book
+from .openlibrary import OpenLibraryError, OpenLibraryUnavailable, extract_description, get_client
+from .search import refresh_documents
+from .streaming import iter_chunks
+
+# Returned by fetch_description for a lookup that failed.
+FAILED = object()
+
+
+@dataclass
+class EnrichmentProgress:
+    total: int
+    processed: int = 0
+    updated: int = 0
+    missing: int = 0
+    failed: int = 0
+    last_pk: int = None
+    started: float = 0
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed else 0
+
+
+def load_checkpoint(path):
+    """
+    Return the last book pk recorded in a checkpoint file, or None.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get('last_pk')
+
+
+def save_checkpoint(path, progress):
+    # Write then rename, so an interrupted run never leaves a torn file.
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'last_pk': progress.last_pk, 'saved_at': timezone.now().isoformat()}, f)
+    os.replace(tmp, path)
+
+
+def fetch_description(client, title):
+    """
+    Look up a description for `title`. Returns None when Open Library has no
+    match, FAILED when the lookup failed or the response had an unexpected
+    shape, and raises OpenLibraryUnavailable when the run should stop.
+    """
+    try:
+        return extract_description(client.search(title))
+    except OpenLibraryUnavailable:
+        raise
+    except (OpenLibraryError, LookupError, TypeError, AttributeError):
+        return FAILED
+
+
+def enrich_descriptions(queryset, concurrency=8, batch_size=100, checkpoint=None, on_progress=None):
+    """
+    Fill in Book.description from Open Library for every book in `queryset`.
+
+    Books are read in pk order, `batch_size` at a time. Each batch is
+    looked up with up to `concurrency` requests in flight and written back
+    with a single bulk_update. When a `checkpoint` path is given, the last
+    written pk is recorded after every batch and a later run resumes after
+    it. Books whose lookup failed are counted and left as they are, a run
+    without the checkpoint picks them up again. If Open Library becomes
+    unavailable (circuit open, rate limit wait too long) the run stops
+    before the current batch is written and OpenLibraryUnavailable is
+    raised.
+    """
+    last_pk = load_checkpoint(checkpoint)
+    if last_pk is not None:
+        queryset = queryset.filter(pk__gt=last_pk)
+    # Admin changelist querysets come with their list_select_related joins
+    queryset = queryset.select_related(None).prefetch_related(None).only('id', 'title', 'description')
+
+    progress = EnrichmentProgress(total=queryset.count(), last_pk=last_pk, started=time.monotonic())
+    client = get_client()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for books in iter_chunks(queryset, chunk_size=batch_size):
+            descriptions = list(pool.map(lambda book: fetch_description(client, book.title), books))
+
+            now = timezone.now()
+            changed = []
+            for book, description in zip(books, descriptions):
+                if description is FAILED:
+                    progress.failed += 1
+                elif description is None:
+                    progress.missing += 1
+                elif description != book.description:
+                    book.description = description
+                    book.updated_at = now
+                    changed.append(book)
+            if changed:
+                # bulk_update skips signals, so refresh what post_save would have.
+                Book.objects.bulk_update(changed, ['description', 'updated_at'])
+                refresh_documents([book.pk for book in changed])
+                bump_versions(Book)
+
+            progress.processed += len(books)
+            progress.updated += len(changed)
+            progress.last_pk = books[-1].pk
+            if checkpoint:
+                save_checkpoint(checkpoint, progress)
+            if on_progress:
+                on_progress(progress)
+    return progress
@@ -0,0 +1,187 @@
+"""
+Streaming CSV/NDJSON exports of books, orders and reviews.
+
+Rows are read with server-side cursors (`.iterator(chunk_size=...)`) and
+rendered and sent a chunk at a time, optionally gzipped on the fly, so
+memory use does not depend on the size of the table.
+"""
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import compress_sequence
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from .inventory import with_stock
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+# rows rendered into each chunk of the response body
+LINES_PER_WRITE = 500
+
+BOOK_FIELDS = (
+    'id', 'title', 'publisher', 'authors', 'genres', 'published_date',
+    'price', 'stock_quantity', 'description', 'updated_at',
+)
+ORDER_FIELDS = (
+    'order_id', 'user', 'status', 'ordered_date', 'total_price',
+    'book_id', 'book_title', 'quantity', 'unit_price',
+)
+REVIEW_FIELDS = ('id', 'book_id', 'book_title', 'user', 'rating', 'review_text', 'created_at')
+
+
+def book_rows(queryset):
+    books = with_stock(queryset).select_related('publisher').prefetch_related('authors', 'genres').order_by('pk')
+    for book in books.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'id': book.pk,
+            'title': book.title,
+            'publisher': book.publisher.name,
+            'authors': "; ".join(f"{author.first_name} {author.last_name}" for author in book.authors.all()),
+            'genres': "; ".join(genre.name for genre in book.genres.all()),
+            'published_date': book.published_date,
+            'price': book.price,
+            'stock_quantity': book.available_stock,
+            'description': book.description,
+            'updated_at': book.updated_at,
+        }
+
+
+def order_rows(queryset):
+    """
+    One row per order item, orders without items get a single row.
+    """
+    items = OrderItem.objects.select_related('book').order_by('pk')
+    orders = queryset.select_related('user').prefetch_related(Prefetch('items', queryset=items)).order_by('pk')
+    for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = {
+            'order_id': order.pk,
+            'user': order.user.username,
+            'status': order.get_status_display(),
+            'ordered_date': order.ordered_date,
+            'total_price': order.total_price,
+        }
+        order_items = order.items.all()
+        if not order_items:
+            yield row
+        for item in order_items:
+            yield {
+                **row,
+                'book_id': item.book_id,
+                'book_title': item.book.title,
+                'quantity': item.quantity,
+                'unit_price': item.book.price,
+            }
+
+
+def review_rows(queryset):
+    reviews = queryset.select_related('book', 'user').order_by('pk')
+    for review in reviews.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'id': review.pk,
+            'book_id': review.book_id,
+            'book_title': review.book.title,
+            'user': review.user.username,
+            'rating': review.rating,
+            'review_text': review.review_text,
+            'created_at': review.created_at,
+        }
+
+
+EXPORTS = {
+    'books': (BOOK_FIELDS, book_rows),
+    'orders': (ORDER_FIELDS, order_rows),
+    'reviews': (REVIEW_FIELDS, review_rows),
+}
+
+
+class _Lines:
+    """
+    File-like object for csv.writer that hands back the written line.
+    """
+    def write(self, value):
+        return value
+
+
+def render_csv(fields, rows):
+    writer = csv.DictWriter(_Lines(), fieldnames=fields)
+    yield writer.writeheader()
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= LINES_PER_WRITE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def render_ndjson(fields, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        if len(lines) >= LINES_PER_WRITE:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+OUTPUTS = {
+    'csv': (render_csv, 'text/csv'),
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+}
+
+
+def export_response(name, queryset, output='csv', compress=False):
+    """
+    Stream the `name` export of `queryset` as a file download.
+    """
+    fields, rows = EXPORTS[name]
+    render, content_type = OUTPUTS[output]
+    body = (chunk.encode() for chunk in render(fields, rows(queryset)))
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{output}"
+    if compress:
+        body = compress_sequence(body)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ExportMixin:
+    """
+    Adds a staff-only `export` action streaming the filtered queryset as
+    `?output=csv|ndjson`, gzipped with `?gzip=1`.
+    """
+    export_name = None
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAdminUser])
+    def export(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in OUTPUTS:
+            return Response(
+                {"error": f"output must be one of: {', '.join(OUTPUTS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+        return export_response(self.export_name, self.filter_queryset(self.get_queryset()), output, compress)
+
+
+def export_action(name, output, compress=False):
+    """
+    Build an admin action exporting the selected objects.
+    """
+    def export(modeladmin, request, queryset):
+        return export_response(name, queryset, output, compress)
+
+    label = output.upper() + (", gzipped" if compress else "")
+    export.__name__ = f"export_{output}{'_gz' if compress else ''}"
+    export.short_description = f"Export selected as {label}"
+    export.allowed_permissions = ('view',)
+    return export
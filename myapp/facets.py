@@ -0,0 +1,85 @@
+"""
+Facet counts for the book list.
+
+`facet_counts()` counts the books of a filtered, possibly searched, result
+set per genre, publisher, price band and publication year. That takes four
+grouped queries however many genres, publishers or years there are. The
+facets endpoint caches the counts under `facet_signature()`, the filters
+as BookFilter cleaned them plus the search tokens. Query strings that only
+differ in parameter order, pagination, ordering or number formatting share
+one entry. The model versions in the cache key retire it when the
+catalogue changes.
+"""
+from decimal import Decimal
+from urllib.parse import urlencode
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from .filters import PRICE_BANDS
+from .models import Book, BookGenre
+from .search import tokenize
+
+# Genres and publishers are listed by count, this many at most
+FACET_LIMIT = 50
+# BookFilter fields that order the results rather than filter them
+ORDERING_FILTERS = ('ordering',)
+
+
+def facet_counts(books, limit=FACET_LIMIT):
+    ids = books.order_by().values('pk')
+    if books.query.annotations:
+        # e.g. the search rank, which must not end up in the GROUP BYs
+        matching = Book.objects.filter(pk__in=ids)
+    else:
+        matching = books.order_by()
+    totals = matching.aggregate(
+        count=Count('pk'),
+        **{band: Count('pk', filter=condition) for band, (_, condition) in PRICE_BANDS.items()},
+    )
+    genres = (
+        BookGenre.objects.filter(books__in=ids)
+        .values('genre', 'genre__name').annotate(count=Count('books', distinct=True))
+        .order_by('-count', 'genre__name')[:limit]
+    )
+    publishers = (
+        matching.values('publisher', 'publisher__name').annotate(count=Count('pk'))
+        .order_by('-count', 'publisher__name')[:limit]
+    )
+    years = (
+        matching.annotate(year=ExtractYear('published_date'))
+        .values('year').annotate(count=Count('pk')).order_by('-year')
+    )
+    return {
+        'count': totals['count'],
+        'genres': [
+            {'id': row['genre'], 'name': row['genre__name'], 'count': row['count']} for row in genres
+        ],
+        'publishers': [
+            {'id': row['publisher'], 'name': row['publisher__name'], 'count': row['count']} for row in publishers
+        ],
+        'price_bands': [
+            {'value': band, 'label': label, 'count': totals[band]} for band, (label, _) in PRICE_BANDS.items()
+        ],
+        'years': [{'year': row['year'], 'count': row['count']} for row in years],
+    }
+
+
+def facet_signature(filterset, terms):
+    """
+    The filters a facet result depends on, normalised, or None when the
+    filterset does not validate.
+    """
+    if not filterset.is_valid():
+        return None
+    filters = sorted(
+        (name, _normalise(value)) for name, value in filterset.form.cleaned_data.items()
+        if name not in ORDERING_FILTERS and value not in (None, '')
+    )
+    tokens = sorted(set(tokenize(terms)))
+    return urlencode([*filters, *(('search', token) for token in tokens)])
+
+
+def _normalise(value):
+    # 20 and 20.00 are the same price
+    if isinstance(value, Decimal):
+        return str(value.normalize())
+    return str(value)
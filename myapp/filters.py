@@ -1,7 +1,39 @@
 from datetime import timedelta, date
 import django_filters
+from django.db.models import Q
 from .models import Book
+from .search import get_search_backend
 from django.contrib.admin import SimpleListFilter
+from rest_framework.filters import SearchFilter
+
+PUBLISHED_DATE_CHOICES = [
+    ('last_7_days', 'Last 7 Days'),
+    ('this_year', 'This Year'),
+    ('today', 'Today'),
+]
+
+
+def published_in(year):
+    """
+    Books published in `year`, as a range on published_date so the
+    published_date indexes serve it.
+    """
+    return Q(published_date__gte=date(year, 1, 1), published_date__lt=date(year + 1, 1, 1))
+
+
+def filter_published(queryset, value):
+    """
+    Apply one of the PUBLISHED_DATE_CHOICES. Every branch is a range or an
+    equality on published_date.
+    """
+    today = date.today()
+    if value == 'last_7_days':
+        return queryset.filter(published_date__gte=today - timedelta(days=7))
+    elif value == 'this_year':
+        return queryset.filter(published_in(today.year))
+    elif value == 'today':
+        return queryset.filter(published_date=today)
+    return queryset
 
 class CustomDateFilter(SimpleListFilter):
     """
@@ -11,21 +43,18 @@ class CustomDateFilter(SimpleListFilter):
     parameter_name = 'published_date'
 
     def lookups(self, request, model_admin):
-        return [
-            ('last_7_days', 'Last 7 Days'),
-            ('this_year', 'This Year'),
-            ('today', 'Today'),
-        ]
+        return PUBLISHED_DATE_CHOICES
 
     def queryset(self, request, queryset):
-        today = date.today()
-        if self.value() == 'last_7_days':
-            return queryset.filter(published_date__gte=today - timedelta(days=7))
-        elif self.value() == 'this_year':
-            return queryset.filter(published_date__year=today.year)
-        elif self.value() == 'today':
-            return queryset.filter(published_date=today)
-        return queryset
+        return filter_published(queryset, self.value())
+
+# value: (label, condition) of the price bands of PriceRangeFilter and the
+# book facets
+PRICE_BANDS = {
+    'cheap': ('Under $20', Q(price__lt=20)),
+    'moderate': ('$20 - $50', Q(price__gte=20, price__lte=50)),
+    'expensive': ('Above $50', Q(price__gt=50)),
+}
 
 class PriceRangeFilter(SimpleListFilter):
     title = 'Price Range'
@@ -35,48 +64,57 @@ class PriceRangeFilter(SimpleListFilter):
         """
         Return a list of the options shown in the admin filter dropdown.
         """
-        return [
-            ('cheap', 'Under $20'),
-            ('moderate', '$20 - $50'),
-            ('expensive', 'Above $50')
-        ]
+        return [(value, label) for value, (label, _) in PRICE_BANDS.items()]
 
     def queryset(self, request, queryset):
         """
-        Modify the queryset based on the selected filter option.
+        Modify the queryset based on the selected filter option. The ranges
+        are served by the price index.
         """
-        if self.value() == 'cheap':
-            return queryset.filter(price__lt=20)
-        elif self.value() == 'moderate':
-            return queryset.filter(price__gte=20, price__lte=50)
-        elif self.value() == 'expensive':
-            return queryset.filter(price__gt=50)
+        if self.value() in PRICE_BANDS:
+            return queryset.filter(PRICE_BANDS[self.value()][1])
         return queryset
 
+# ?ordering= values of BookFilter, with a unique tie-breaker so keyset
+# pagination can follow them. Backed by the (rating_score, id) index.
+BOOK_ORDERINGS = {
+    'rating': ('rating_score', 'id'),
+    '-rating': ('-rating_score', '-id'),
+}
+
 class BookFilter(django_filters.FilterSet):
     published_date = django_filters.DateFilter(field_name='published_date', lookup_expr='exact')
     price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     published_date_range = django_filters.ChoiceFilter(
         field_name='published_date',
-        choices=[
-            ('last_7_days', 'Last 7 Days'),
-            ('this_year', 'This Year'),
-            ('today', 'Today'),
-        ],
+        choices=PUBLISHED_DATE_CHOICES,
         method='filter_by_published_date'
     )
+    # `-rating` lists the best rated books first
+    ordering = django_filters.ChoiceFilter(
+        choices=[('rating', 'Rating, ascending'), ('-rating', 'Rating, descending')],
+        method='order_by_rating'
+    )
 
     class Meta:
         model = Book
         fields = ['published_date', 'price']
 
     def filter_by_published_date(self, queryset, name, value):
-        today = date.today()
-        if value == 'last_7_days':
-            return queryset.filter(published_date__gte=today - timedelta(days=7))
-        elif value == 'this_year':
-            return queryset.filter(published_date__year=today.year)
-        elif value == 'today':
-            return queryset.filter(published_date=today)
-        return queryset
\ No newline at end of file
+        return filter_published(queryset, value)
+
+    def order_by_rating(self, queryset, name, value):
+        return queryset.order_by(*BOOK_ORDERINGS[value])
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    `?search=` for books, served by the configured full-text search backend
+    and ordered by rank.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, terms)
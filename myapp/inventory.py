@@ -0,0 +1,217 @@
+"""
+Stock bookkeeping for orders.
+
+Most books keep their stock in `Book.stock_quantity`. Hot titles can have
+it split over `StockShard` counters (`set_stock_shards`), so concurrent
+checkouts decrement different rows instead of queueing on one row lock.
+For those, `stock_quantity` holds the total as of the last rebalance and
+reads use `with_stock()`, which adds up the shards.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import bump_versions
+from .models import Book, StockShard
+
+
+class InsufficientStock(Exception):
+    """
+    Some books do not have the requested quantity in stock. `shortages`
+    maps each of them to the quantity still available.
+    """
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(", ".join(f"{book.title}: {available} available" for book, available in shortages.items()))
+
+
+def decrement_stock(quantities):
+    """
+    Take `quantities` ({book pk: n}) out of stock, all or nothing.
+
+    The rows of unsharded books are locked in pk order first, so concurrent
+    orders touching the same books queue up instead of deadlocking. All
+    those lines are then decremented by one conditional UPDATE:
+
+        UPDATE book SET stock_quantity = stock_quantity - CASE id WHEN .. END
+        WHERE id IN (..) AND stock_quantity >= CASE id WHEN .. END
+
+    Books with sharded stock are then taken from their shards, in pk order
+    too, see take_from_shards().
+
+    If anything is short, nothing is decremented and InsufficientStock is
+    raised. Must run inside the transaction that records the order, so the
+    locks are held until it commits.
+    """
+    if not quantities:
+        return
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("decrement_stock() must be called inside a transaction.")
+
+    ids = sorted(quantities)
+    # A savepoint, so a partial decrement is undone when raising.
+    with transaction.atomic():
+        # Sharded books are left unlocked, that is the point of sharding them.
+        # The lock re-reads stock_shard_count, so a book being sharded
+        # concurrently is seen in its new state.
+        unsharded = list(
+            Book.objects.select_for_update().filter(pk__in=ids, stock_shard_count=0)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        short = {}
+        if unsharded:
+            requested = Case(
+                *[When(pk=pk, then=Value(quantities[pk])) for pk in unsharded],
+                output_field=IntegerField(),
+            )
+            updated = Book.objects.filter(pk__in=unsharded, stock_quantity__gte=requested).update(
+                stock_quantity=F('stock_quantity') - requested,
+                updated_at=timezone.now(),
+            )
+            if updated != len(unsharded):
+                # The rows are still locked, so this read is what the UPDATE saw.
+                short.update(
+                    (pk, available)
+                    for pk, available in Book.objects.filter(pk__in=unsharded).values_list('pk', 'stock_quantity')
+                    if available < quantities[pk]
+                )
+        locked = set(unsharded)
+        for pk in ids:
+            if pk not in locked:
+                available = take_from_shards(pk, quantities[pk])
+                if available is not None:
+                    short[pk] = available
+        if short:
+            raise InsufficientStock({
+                book: short[book.pk] for book in Book.objects.filter(pk__in=short).only('id', 'title').order_by('pk')
+            })
+    # update() sends no post_save
+    bump_versions(Book)
+
+
+def take_from_shards(book_id, quantity):
+    """
+    Take `quantity` out of the stock shards of a book. Returns None when
+    done, or the quantity available when there is not enough.
+
+    A random shard that can cover the whole quantity and is not locked by
+    another order is locked (SKIP LOCKED) and decremented, so concurrent
+    orders spread over the shards without waiting on each other. Only when
+    there is none are all shards of the book locked, in shard order, and
+    the quantity collected across them.
+
+    Waiting on a single shard instead is no good: Postgres keeps the lock
+    of a row it waited for even when the row no longer qualifies, and that
+    lock, taken out of order, can deadlock with the fallback.
+    """
+    shard = (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(book_id=book_id, quantity__gte=quantity).order_by('?').values_list('pk', flat=True).first()
+    )
+    if shard is not None:
+        StockShard.objects.filter(pk=shard).update(quantity=F('quantity') - quantity)
+        return None
+
+    shards = list(StockShard.objects.select_for_update().filter(book_id=book_id).order_by('shard'))
+    available = sum(shard.quantity for shard in shards)
+    if available < quantity:
+        return available
+    remaining = quantity
+    for shard in shards:
+        taken = min(shard.quantity, remaining)
+        if taken:
+            StockShard.objects.filter(pk=shard.pk).update(quantity=F('quantity') - taken)
+            remaining -= taken
+        if not remaining:
+            return None
+
+
+def split(total, shards):
+    """
+    Split `total` over `shards` counters as evenly as possible.
+    """
+    return [total // shards + (shard < total % shards) for shard in range(shards)]
+
+
+def set_stock_shards(book_id, shards, stock=None):
+    """
+    Spread the stock of a book evenly over `shards` counters, or fold it
+    back into Book.stock_quantity with 0 shards. `stock` replaces the
+    current stock when given. Returns the stock.
+
+    Also what rebalancing does: the shards are locked for the duration,
+    so orders on the book wait for it rather than see a partial state.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().only('id', 'stock_quantity', 'stock_shard_count').get(pk=book_id)
+        current = {
+            shard.shard: shard
+            for shard in StockShard.objects.select_for_update().filter(book_id=book_id).order_by('shard')
+        }
+        if stock is None:
+            if book.stock_shard_count:
+                stock = sum(shard.quantity for shard in current.values())
+            else:
+                stock = book.stock_quantity
+
+        added, changed = [], []
+        for number, quantity in enumerate(split(stock, shards)):
+            shard = current.pop(number, None)
+            if shard is None:
+                added.append(StockShard(book_id=book_id, shard=number, quantity=quantity))
+            elif shard.quantity != quantity:
+                shard.quantity = quantity
+                changed.append(shard)
+        if current:
+            StockShard.objects.filter(pk__in=[shard.pk for shard in current.values()]).delete()
+        StockShard.objects.bulk_create(added)
+        StockShard.objects.bulk_update(changed, ['quantity'])
+
+        if (book.stock_quantity, book.stock_shard_count) != (stock, shards):
+            Book.objects.filter(pk=book_id).update(
+                stock_quantity=stock,
+                stock_shard_count=shards,
+                updated_at=timezone.now(),
+            )
+    bump_versions(Book)
+    return stock
+
+
+def rebalance_stock(book_id):
+    """
+    Even out the shards of a book and record their total in
+    Book.stock_quantity. Returns the stock, or None when the book is not
+    sharded (anymore).
+    """
+    shards = Book.objects.filter(pk=book_id).values_list('stock_shard_count', flat=True).first()
+    if not shards:
+        return None
+    return set_stock_shards(book_id, shards)
+
+
+def with_stock(queryset):
+    """
+    Annotate the books with `available_stock`: stock_quantity, or the sum of
+    their shards when the stock is sharded.
+    """
+    shard_total = (
+        StockShard.objects.filter(book=OuterRef('pk'))
+        .values('book').annotate(total=Sum('quantity')).values('total')
+    )
+    return queryset.annotate(available_stock=Case(
+        When(stock_shard_count=0, then=F('stock_quantity')),
+        default=Coalesce(Subquery(shard_total), 0, output_field=IntegerField()),
+        output_field=IntegerField(),
+    ))
+
+
+def available_stock(book):
+    """
+    The stock of `book`, from the `with_stock()` annotation when present.
+    """
+    available = getattr(book, 'available_stock', None)
+    if available is not None:
+        return available
+    if not book.stock_shard_count:
+        return book.stock_quantity
+    return StockShard.objects.filter(book=book).aggregate(total=Coalesce(Sum('quantity'), 0))['total']
@@ -0,0 +1,158 @@
+"""
+Top-rated and bestseller leaderboards, read from precomputed rankings.
+
+`refresh_leaderboards()` runs periodically (`manage.py refresh_leaderboards`).
+It folds the order items added since the last run into per-day sales
+(BookSales), then rebuilds the BookRanking rows of only the books that saw
+activity: new sales or reviews, changed ratings or genres, or sales days
+that dropped out of a window. Each book is ranked overall, in each of its
+genres and for its publisher, so a leaderboard page is one index range scan
+of `page size` rows.
+
+Items are picked up by pk, so one committed after a later one was already
+processed is missed; `--full` rebuilds everything from scratch.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Book, BookGenre, BookRanking, BookSales, LeaderboardState, OrderItem, Review
+
+# days: BookRanking field with the units sold in that many days up to today
+WINDOWS = {7: 'units_7d', 30: 'units_30d'}
+REFRESH_BATCH_SIZE = 500
+
+
+def scope_for(genre=None, publisher=None):
+    if genre is not None:
+        return f'genre:{genre}'
+    if publisher is not None:
+        return f'publisher:{publisher}'
+    return 'all'
+
+
+def top_rated(scope='all', limit=10):
+    return list(
+        BookRanking.objects.filter(scope=scope, rating_count__gt=0)
+        .select_related('book').only('rating_score', 'rating_count', 'book__title')
+        .order_by('-rating_score', '-book')[:limit]
+    )
+
+
+def bestsellers(scope='all', days=7, limit=10):
+    field = WINDOWS[days]
+    return list(
+        BookRanking.objects.filter(scope=scope, **{f'{field}__gt': 0})
+        .select_related('book').only(field, 'book__title')
+        .order_by(f'-{field}', '-book')[:limit]
+    )
+
+
+def refresh_leaderboards(full=False, now=None, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Bring the rankings up to date. Returns the number of books re-ranked.
+    Concurrent refreshes queue on the state row.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    first_day = today - timedelta(days=max(WINDOWS) - 1)
+    with transaction.atomic():
+        state, _ = LeaderboardState.objects.select_for_update().get_or_create(pk=1)
+        last_item = OrderItem.objects.aggregate(last=Max('pk'))['last'] or 0
+        last_review = Review.objects.aggregate(last=Max('pk'))['last'] or 0
+
+        if full:
+            BookSales.objects.all().delete()
+            BookRanking.objects.all().delete()
+            record_sales(OrderItem.objects.filter(pk__lte=last_item), first_day, batch_size)
+            book_ids = Book.objects.order_by('pk').values_list('pk', flat=True)
+        else:
+            items = OrderItem.objects.filter(pk__gt=state.last_order_item, pk__lte=last_item)
+            book_ids = record_sales(items, first_day, batch_size)
+            book_ids |= set(
+                Review.objects.filter(pk__gt=state.last_review, pk__lte=last_review).values_list('book_id', flat=True)
+            )
+            if state.refreshed_at is not None:
+                # Rating changes (review edits and deletes) touch updated_at.
+                book_ids |= set(Book.objects.filter(updated_at__gte=state.refreshed_at).values_list('pk', flat=True))
+                book_ids |= set(
+                    BookGenre.objects.filter(created_at__gte=state.refreshed_at).values_list('books_id', flat=True)
+                )
+                previous = timezone.localdate(state.refreshed_at)
+                for days in WINDOWS:
+                    # Sales days that left the window since the last refresh
+                    book_ids |= set(BookSales.objects.filter(
+                        day__gt=previous - timedelta(days=days), day__lte=today - timedelta(days=days)
+                    ).values_list('book_id', flat=True))
+            book_ids = sorted(book_ids)
+
+        BookSales.objects.filter(day__lt=first_day).delete()
+        ranked = rank_books(book_ids, today, batch_size)
+        state.last_order_item, state.last_review, state.refreshed_at = last_item, last_review, now
+        state.save()
+    return ranked
+
+
+def record_sales(items, first_day, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Add the units of `items` (OrderItems) to the daily sales of their books,
+    ignoring days before `first_day`. Returns the ids of the books sold.
+    """
+    rows = (
+        items.filter(order__ordered_date__date__gte=first_day)
+        .annotate(day=TruncDate('order__ordered_date'))
+        .values('book_id', 'day').annotate(units=Sum('quantity')).order_by()
+    )
+    sales = defaultdict(dict)
+    for row in rows:
+        sales[row['book_id']][row['day']] = row['units']
+
+    book_ids = sorted(sales)
+    for start in range(0, len(book_ids), batch_size):
+        batch = book_ids[start:start + batch_size]
+        existing = BookSales.objects.filter(book_id__in=batch, day__gte=first_day)
+        for day_sales in existing:
+            day_sales.units += sales[day_sales.book_id].pop(day_sales.day, 0)
+        BookSales.objects.bulk_update(existing, ['units'])
+        BookSales.objects.bulk_create([
+            BookSales(book_id=book_id, day=day, units=units)
+            for book_id in batch for day, units in sales[book_id].items()
+        ])
+    return set(book_ids)
+
+
+def rank_books(book_ids, today, batch_size=REFRESH_BATCH_SIZE):
+    """
+    Replace the BookRanking rows of the books in `book_ids`. Books with
+    neither ratings nor sales in the longest window are left out.
+    """
+    starts = {field: today - timedelta(days=days - 1) for days, field in WINDOWS.items()}
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), batch_size):
+        batch = book_ids[start:start + batch_size]
+        genres = defaultdict(list)
+        for book_id, genre_id in BookGenre.objects.filter(books_id__in=batch).values_list('books_id', 'genre_id'):
+            genres[book_id].append(genre_id)
+        units = {
+            row['book_id']: row
+            for row in BookSales.objects.filter(book_id__in=batch, day__gte=min(starts.values()))
+            .values('book_id').order_by()
+            .annotate(**{field: Sum('units', filter=Q(day__gte=day)) for field, day in starts.items()})
+        }
+
+        rankings = []
+        books = Book.objects.filter(pk__in=batch).values_list('pk', 'publisher_id', 'rating_score', 'rating_count')
+        for book_id, publisher_id, rating_score, rating_count in books:
+            sold = {field: units.get(book_id, {}).get(field) or 0 for field in WINDOWS.values()}
+            if not rating_count and not any(sold.values()):
+                continue
+            scopes = ['all', scope_for(publisher=publisher_id), *(scope_for(genre=genre) for genre in genres[book_id])]
+            rankings.extend(
+                BookRanking(scope=scope, book_id=book_id, rating_score=rating_score, rating_count=rating_count, **sold)
+                for scope in scopes
+            )
+        BookRanking.objects.filter(book_id__in=batch).delete()
+        BookRanking.objects.bulk_create(rankings)
+    return len(book_ids)
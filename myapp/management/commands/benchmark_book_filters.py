@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.timezone import now
+from rest_framework.test import APIRequestFactory, force_authenticate
+from myapp.cache import bump_versions
+from myapp.models import Book, Publisher
+from myapp.views import BookViewSet
+
+POPULATE_BATCH_SIZE = 10000
+# Published dates are spread over this many years up to today
+YEARS = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the filtered book list of the API and the admin, the database "
+        "work without the response cache. --populate first adds synthetic "
+        "books up to --books."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1_000_000)
+        parser.add_argument('--publishers', type=int, default=100)
+        parser.add_argument('--populate', action='store_true', help="Add synthetic books up to --books.")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--explain', action='store_true', help="Print the plan of each shape's slowest query.")
+
+    def handle(self, *args, **options):
+        if options['populate']:
+            self.populate(options['books'], options['publishers'])
+        total = Book.objects.count()
+        self.stdout.write(f"{total} books, {connection.vendor}, {options['repeat']} runs per shape")
+
+        user = get_user_model()(username='benchmark', is_active=True, is_staff=True, is_superuser=True)
+        publisher = Book.objects.values_list('publisher_id', flat=True).first()
+        year = now().year
+        shapes = [
+            ('api this_year', self.api, {'published_date_range': 'this_year'}),
+            ('api last_7_days', self.api, {'published_date_range': 'last_7_days'}),
+            ('api price 20-50', self.api, {'price_min': '20', 'price_max': '50'}),
+            ('api price 150+ this_year', self.api, {'price_min': '150', 'published_date_range': 'this_year'}),
+            ('api published_date', self.api, {'published_date': date(year, 1, 1).isoformat()}),
+            ('admin this year', self.admin, {}),
+            ('admin price moderate', self.admin, {'price_range': 'moderate'}),
+            ('admin publisher', self.admin, {'publisher__id__exact': str(publisher)}),
+        ]
+        # Requests are built in process, as from the test client
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, run, params in shapes:
+                self.measure(name, run, params, user, options['repeat'], options['explain'])
+
+    def measure(self, name, run, params, user, repeat, explain):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            count, approximate = run(params, user)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(params, user)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{name:<26} median {statistics.median(timings):8.1f} ms  p95 {p95:8.1f} ms  "
+            f"{'~' if approximate else ''}{count} rows, {len(queries)} queries"
+        )
+        if explain and queries.captured_queries:
+            slowest = max(queries.captured_queries, key=lambda query: float(query['time']))
+            prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {slowest['sql']}")
+                for row in cursor.fetchall():
+                    self.stdout.write(f"    {row[-1]}")
+
+    def api(self, params, user):
+        request = APIRequestFactory().get('/books/', params)
+        force_authenticate(request, user=user)
+        response = BookViewSet.as_view({'get': 'list'}, basename='book')(request)
+        assert response.status_code == 200, response.data
+        return response.data['count'], response.data['count_approximate']
+
+    def admin(self, params, user):
+        request = APIRequestFactory().get('/admin/myapp/book/', params)
+        request.user = user
+        response = admin.site._registry[Book].changelist_view(request)
+        assert response.status_code == 200, response.status_code
+        changelist = response.context_data['cl']
+        return changelist.result_count, getattr(changelist.paginator, 'approximate', False)
+
+    def populate(self, books, publishers):
+        missing = books - Book.objects.count()
+        if missing <= 0:
+            return
+        publisher_ids = [
+            Publisher.objects.get_or_create(name=f"Benchmark Press {n}", defaults={'established_year': 2000})[0].pk
+            for n in range(publishers)
+        ]
+        today = date.today()
+        days = YEARS * 365
+        rng = random.Random(0)
+        for start in range(0, missing, POPULATE_BATCH_SIZE):
+            with transaction.atomic():
+                Book.objects.bulk_create([
+                    Book(
+                        title=f"Benchmark book {start + n}",
+                        publisher_id=rng.choice(publisher_ids),
+                        published_date=today - timedelta(days=rng.randrange(days)),
+                        price=Decimal(rng.randrange(100, 20000)) / 100,
+                        stock_quantity=rng.randrange(100),
+                        cover_photo='',
+                    )
+                    for n in range(min(POPULATE_BATCH_SIZE, missing - start))
+                ])
+            self.stdout.write(f"Added {min(start + POPULATE_BATCH_SIZE, missing)} of {missing} books", ending='\r')
+        self.stdout.write('')
+        # bulk_create sends no post_save
+        bump_versions(Book)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Book._meta.db_table}")
@@ -0,0 +1,49 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from myapp.enrichment import enrich_descriptions
+from myapp.models import Book
+from myapp.openlibrary import OpenLibraryUnavailable
+
+
+class Command(BaseCommand):
+    help = "Fetch book descriptions from Open Library, several requests at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help="Open Library requests in flight.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Books written per bulk update.")
+        parser.add_argument('--checkpoint', help="File recording progress, a rerun resumes from it.")
+        parser.add_argument('--reset', action='store_true', help="Ignore and remove an existing checkpoint.")
+        parser.add_argument('--all', action='store_true', help="Also refresh books that have a description.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--concurrency and --batch-size must be positive.")
+        checkpoint = options['checkpoint']
+        if checkpoint and options['reset'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        queryset = Book.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(description='')
+
+        try:
+            progress = enrich_descriptions(
+                queryset,
+                concurrency=options['concurrency'],
+                batch_size=options['batch_size'],
+                checkpoint=checkpoint,
+                on_progress=self.report,
+            )
+        except OpenLibraryUnavailable as e:
+            raise CommandError(f"Stopped, Open Library is unavailable: {e}. Rerun with the same --checkpoint to resume.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {progress.updated} of {progress.processed} books "
+            f"({progress.missing} without a match, {progress.failed} failed)."
+        ))
+
+    def report(self, progress):
+        self.stdout.write(
+            f"{progress.processed}/{progress.total} books, {progress.updated} updated, "
+            f"{progress.failed} failed, {progress.rate:.1f} books/s"
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from myapp.models import Book
+from myapp.renditions import get_pool, needs_renditions, read_cover, render, save_renditions
+from myapp.streaming import iter_chunks
+
+
+class Command(BaseCommand):
+    help = "Render the resized cover renditions of books that are missing them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--all', action='store_true', help="Render every cover again.")
+
+    def handle(self, *args, **options):
+        pool = get_pool()
+        queryset = Book.objects.exclude(cover_photo='').only('id', 'cover_photo', 'cover_renditions')
+        rendered = failed = 0
+        for books in iter_chunks(queryset, chunk_size=options['batch_size']):
+            if not options['all']:
+                books = [book for book in books if needs_renditions(book)]
+            jobs = []
+            for book in books:
+                try:
+                    data = read_cover(book)
+                except OSError as e:
+                    self.stderr.write(f"Book {book.pk}: {e}")
+                    failed += 1
+                    continue
+                jobs.append((book, pool.submit(render, data)))
+            for book, job in jobs:
+                try:
+                    save_renditions(book, job.result())
+                except Exception as e:
+                    self.stderr.write(f"Book {book.pk}: {e}")
+                    failed += 1
+                else:
+                    rendered += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} covers, {failed} failed."))
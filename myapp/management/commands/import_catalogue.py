@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.catalogue import CatalogueImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import publishers, authors, genres and books from CSV or NDJSON files "
+        "(optionally .gz). Books reference publishers and genres by name and "
+        "authors by \"First Last\"; list columns are separated by ';'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publishers', help="Columns: name, location, established_year, website, contact_email.")
+        parser.add_argument('--authors', help="Columns: first_name, last_name, nationality.")
+        parser.add_argument('--genres', help="Columns: name, description.")
+        parser.add_argument('--books', help="Columns: title, published_date, price, stock_quantity, description, publisher, authors, genres.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-index', action='store_true', help="Leave search documents to rebuild_search_index.")
+
+    def handle(self, *args, **options):
+        files = [(kind, options[kind]) for kind in ('publishers', 'authors', 'genres', 'books') if options[kind]]
+        if not files:
+            raise CommandError("Give at least one of --publishers, --authors, --genres or --books.")
+
+        importer = CatalogueImporter(
+            batch_size=options['batch_size'],
+            index=not options['skip_index'],
+            on_progress=self.report,
+        )
+        for kind, path in files:
+            try:
+                rows = read_rows(path, options['format'])
+                imported = getattr(importer, f'import_{kind}')(rows)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {path}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"Imported {imported} {kind}."))
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        if importer.error_count:
+            self.stderr.write(f"{importer.error_count} rows were skipped.")
+
+    def report(self, kind, imported, rate):
+        self.stdout.write(f"{kind}: {imported} rows, {rate:,.0f} rows/s")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from myapp.inventory import rebalance_stock
+from myapp.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Even out the stock shards of sharded books and record their total in "
+        "Book.stock_quantity. Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('books', nargs='*', type=int, help="Book ids, all sharded books by default.")
+
+    def handle(self, *args, **options):
+        books = Book.objects.filter(stock_shard_count__gt=0)
+        if options['books']:
+            books = books.filter(pk__in=options['books'])
+        rebalanced = 0
+        for book_id in list(books.order_by('pk').values_list('pk', flat=True)):
+            # One short transaction per book, orders only wait on one at a time.
+            if rebalance_stock(book_id) is not None:
+                rebalanced += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebalanced {rebalanced} books."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from myapp.models import Book
+from myapp.search import refresh_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of every book."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        book_ids = Book.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        batch = []
+        for pk in book_ids.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                refresh_documents(batch, batch_size=batch_size)
+                total += len(batch)
+                batch = []
+        refresh_documents(batch, batch_size=batch_size)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {total} books."))
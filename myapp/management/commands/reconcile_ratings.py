@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from myapp.ratings import RECONCILE_BATCH_SIZE, reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the rating aggregates of every book from its reviews, e.g. after "
+        "changing the rating prior or writing reviews without signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Fixed the ratings of {fixed} books."))
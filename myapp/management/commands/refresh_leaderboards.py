@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from myapp.leaderboards import REFRESH_BATCH_SIZE, refresh_leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the top-rated and bestseller rankings with the orders and reviews since "
+        "the last run. Meant to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild all rankings from scratch.")
+        parser.add_argument('--batch-size', type=int, default=REFRESH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        ranked = refresh_leaderboards(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} books."))
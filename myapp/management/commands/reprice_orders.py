@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from myapp.models import Order
+from myapp.pricing import REPRICE_BATCH_SIZE, reprice_orders
+
+
+class Command(BaseCommand):
+    help = "Recalculate order totals from the current book prices, e.g. after a price correction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--book', type=int, action='append', help="Only orders containing this book, repeatable.")
+        parser.add_argument('--status', action='append', choices=[code for code, _ in Order.ORDER_STATUS_CHOICES])
+        parser.add_argument('--batch-size', type=int, default=REPRICE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['book']:
+            orders = orders.filter(pk__in=Order.objects.filter(items__book__in=options['book']).values('pk'))
+        if options['status']:
+            orders = orders.filter(status__in=options['status'])
+        updated = reprice_orders(orders, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Repriced {updated} orders."))
@@ -0,0 +1,44 @@
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from myapp.cache import bump_versions
+from myapp.models import Book, MediaBlob
+
+
+class Command(BaseCommand):
+    help = "Move covers uploaded before content-addressed storage into the sharded layout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        field = Book._meta.get_field('cover_photo')
+        storage = field.storage
+        tracked = set(MediaBlob.objects.values_list('name', flat=True))
+        books = Book.objects.exclude(cover_photo='').only('id', 'cover_photo').order_by('pk')
+
+        moved = missing = 0
+        originals = set()
+        for book in books.iterator(chunk_size=options['batch_size']):
+            name = book.cover_photo.name
+            if name in tracked:
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f"Book {book.pk}: {name} does not exist.")
+                missing += 1
+                continue
+            with storage.open(name, 'rb') as f:
+                # every book gets its own reference, identical files share one blob
+                new_name = storage.save(field.generate_filename(book, name.rsplit('/', 1)[-1]), f)
+            Book.objects.filter(pk=book.pk).update(cover_photo=new_name)
+            originals.add(name)
+            moved += 1
+        if moved:
+            # update() sends no post_save
+            bump_versions(Book)
+
+        for name in originals:
+            # Untracked files are ignored by ContentAddressedStorage.delete().
+            FileSystemStorage.delete(storage, name)
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} covers ({len(originals)} files), {missing} missing."
+        ))
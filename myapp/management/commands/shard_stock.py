@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.inventory import set_stock_shards
+from myapp.models import Book
+
+
+class Command(BaseCommand):
+    help = "Split the stock of hot books over several counters, or merge it back with --shards=0."
+
+    def add_arguments(self, parser):
+        parser.add_argument('books', nargs='+', type=int, help="Book ids.")
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        shards = options['shards']
+        if not 0 <= shards <= 1000:
+            raise CommandError("--shards must be between 0 and 1000.")
+        for book_id in options['books']:
+            try:
+                stock = set_stock_shards(book_id, shards)
+            except Book.DoesNotExist:
+                raise CommandError(f"Book {book_id} does not exist.")
+            self.stdout.write(f"Book {book_id}: {stock} in stock over {shards} shards.")
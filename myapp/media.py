@@ -0,0 +1,143 @@
+import os
+import re
+import stat
+import mimetypes
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Names written by ContentAddressedStorage end in their sha256.
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{64})\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    Read-only view of `length` bytes of an open file from its current
+    position. fileno() is passed through, so servers that send files with
+    os.sendfile() (gunicorn, for one) still do so, using the position and
+    Content-Length; everything else reads no further than the range.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) for a single `bytes=` range, None when the header
+    should be ignored, or raise ValueError when it cannot be satisfied.
+    Multiple ranges are answered with the whole file.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N is the last N bytes
+        length = int(end)
+        if not length:
+            raise ValueError("Empty suffix range.")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range outside the file.")
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT.
+
+    The body is a FileResponse over the open file, so WSGI servers with
+    wsgi.file_wrapper hand it to sendfile() without copying it through
+    Python. Single byte ranges, If-Range, ETag/If-None-Match and
+    If-Modified-Since are supported. Content-hashed names never change and
+    are cached as immutable. With MEDIA_ACCEL_REDIRECT set, the transfer
+    is left to the front-end server instead (nginx X-Accel-Redirect).
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found.")
+    try:
+        stats = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found.")
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404("Not found.")
+
+    hashed = HASHED_NAME.search(path)
+    if hashed:
+        etag = f'"{hashed.group(1)}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{stats.st_mtime_ns:x}-{stats.st_size:x}"'
+        cache_control = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    last_modified = int(stats.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = file_response(request, full_path, path, stats.st_size, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def file_response(request, full_path, path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range in (etag, http_date(last_modified))):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # nginx serves the file (and the range) from an internal location.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + path
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,104 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DOCUMENT_TABLE = 'myapp_booksearchdocument'
+FTS_TABLE = 'myapp_booksearchdocument_fts'
+
+POSTGRES_FORWARDS = [
+    f"""
+    CREATE INDEX booksearchdocument_vector_gin ON {DOCUMENT_TABLE} USING gin ((
+        setweight(to_tsvector('english'::regconfig, coalesce(primary_text, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(secondary_text, '')), 'B')
+    ))
+    """,
+]
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS booksearchdocument_vector_gin",
+]
+
+SQLITE_FORWARDS = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        primary_text, secondary_text,
+        content='{DOCUMENT_TABLE}', content_rowid='book_id',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, primary_text, secondary_text)
+        VALUES (new.book_id, new.primary_text, new.secondary_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, primary_text, secondary_text)
+        VALUES ('delete', old.book_id, old.primary_text, old.secondary_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, primary_text, secondary_text)
+        VALUES ('delete', old.book_id, old.primary_text, old.secondary_text);
+        INSERT INTO {FTS_TABLE}(rowid, primary_text, secondary_text)
+        VALUES (new.book_id, new.primary_text, new.secondary_text);
+    END
+    """,
+]
+SQLITE_BACKWARDS = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run_vendor_sql(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+def build_documents(apps, schema_editor):
+    Book = apps.get_model('myapp', 'Book')
+    BookSearchDocument = apps.get_model('myapp', 'BookSearchDocument')
+    books = Book.objects.select_related('publisher').prefetch_related('authors', 'genres').order_by('pk')
+    documents = []
+    for book in books.iterator(chunk_size=500):
+        authors = " ".join(f"{author.first_name} {author.last_name}" for author in book.authors.all())
+        genres = " ".join(genre.name for genre in book.genres.all())
+        documents.append(BookSearchDocument(
+            book=book,
+            primary_text=f"{book.title} {authors}".strip(),
+            secondary_text=" ".join(filter(None, [book.description, book.publisher.name, genres])),
+        ))
+        if len(documents) >= 500:
+            BookSearchDocument.objects.bulk_create(documents)
+            documents = []
+    BookSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_book_order_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='myapp.book')),
+                ('primary_text', models.TextField(blank=True)),
+                ('secondary_text', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRES_FORWARDS, 'sqlite': SQLITE_FORWARDS}),
+            run_vendor_sql({'postgresql': POSTGRES_BACKWARDS, 'sqlite': SQLITE_BACKWARDS}),
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
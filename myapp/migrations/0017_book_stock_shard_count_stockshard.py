@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_mediablob_alter_book_cover_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='stock_shard_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='myapp.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('book', 'shard'), name='stockshard_book_shard_uniq')],
+            },
+        ),
+    ]
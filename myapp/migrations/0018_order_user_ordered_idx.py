@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_book_stock_shard_count_stockshard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'ordered_date', 'id'], name='order_user_ordered_idx'),
+        ),
+    ]
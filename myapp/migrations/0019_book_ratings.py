@@ -0,0 +1,93 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:47
+
+import myapp.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+HISTOGRAM_FIELDS = {stars: f'rating_count_{stars}' for stars in range(1, 6)}
+RATING_FIELDS = ['rating_count', 'rating_sum', *HISTOGRAM_FIELDS.values(), 'rating_score']
+
+
+def backfill_ratings(apps, schema_editor):
+    # Same aggregates and Bayesian score as myapp.ratings.reconcile_ratings()
+    Book = apps.get_model('myapp', 'Book')
+    Review = apps.get_model('myapp', 'Review')
+    weight = getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+    mean = getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+    rows = (
+        Review.objects.values('book').order_by('book')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{field: Count('id', filter=Q(rating=stars)) for stars, field in HISTOGRAM_FIELDS.items()},
+        )
+    )
+    books = []
+    for row in rows.iterator(chunk_size=500):
+        books.append(Book(
+            pk=row['book'],
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            rating_score=(float(weight * mean) + row['total']) / (float(weight) + row['count']),
+            **{field: row[field] for field in HISTOGRAM_FIELDS.values()},
+        ))
+        if len(books) >= 500:
+            Book.objects.bulk_update(books, RATING_FIELDS)
+            books = []
+    Book.objects.bulk_update(books, RATING_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_order_user_ordered_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_score',
+            field=models.FloatField(default=myapp.models.default_rating_score, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating_score', 'id'], name='book_rating_score_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0019_book_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_item', models.BigIntegerField(default=0)),
+                ('last_review', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('rating_score', models.FloatField()),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('units_7d', models.PositiveIntegerField(default=0)),
+                ('units_30d', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='myapp.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'rating_score', 'book'], name='ranking_rated_idx'), models.Index(fields=['scope', 'units_7d', 'book'], name='ranking_sold_7d_idx'), models.Index(fields=['scope', 'units_30d', 'book'], name='ranking_sold_30d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'book'), name='bookranking_scope_book_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='myapp.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='booksales_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('book', 'day'), name='booksales_book_day_uniq')],
+            },
+        ),
+    ]
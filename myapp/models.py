@@ -1,6 +1,10 @@
+from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Sum
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth.models import User
+from .storage import cover_storage
 
 
 class Publisher(models.Model):
@@ -38,6 +42,10 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+def default_rating_score():
+    # A book without reviews scores the prior mean, see myapp/ratings.py
+    return getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+
 class Book(models.Model):
     title= models.CharField(max_length=100)
     authors = models.ManyToManyField(Author, related_name='books',blank=True)  # Many-to-Many
@@ -47,12 +55,84 @@ class Book(models.Model):
     price= models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.PositiveIntegerField(default=0)
     description = models.TextField(blank=True)
-    cover_photo = models.ImageField(upload_to='covers/')
+    cover_photo = models.ImageField(upload_to='covers/', storage=cover_storage)
+    # Resized copies of cover_photo, filled in by myapp.renditions
+    cover_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # When non-zero the stock is split over this many StockShard rows and
+    # stock_quantity is their last reconciled total, see myapp/inventory.py
+    stock_shard_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Review aggregates, maintained by myapp/ratings.py
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_count_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_count_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_count_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_count_5 = models.PositiveIntegerField(default=0, editable=False)
+    rating_score = models.FloatField(default=default_rating_score, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (published_date, id)
+            models.Index(fields=['published_date', 'id'], name='book_published_id_idx'),
+            # Backs ?ordering=rating and its keyset pagination
+            models.Index(fields=['rating_score', 'id'], name='book_rating_score_idx'),
+            # Backs price_min/price_max and the admin price ranges; date
+            # ranges use book_published_id_idx
+            models.Index(fields=['price'], name='book_price_idx'),
+            # Backs a publisher's books within a date range
+            models.Index(fields=['publisher', 'published_date'], name='book_publisher_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
-    
+
+class StockShard(models.Model):
+    """
+    One of the counters a hot book's stock is split over, so concurrent
+    orders decrement different rows instead of queueing on the book.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'shard'], name='stockshard_book_shard_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.shard} of book {self.book_id}: {self.quantity}"
+
+class BookSearchDocument(models.Model):
+    """
+    Denormalised search text for a Book, kept up to date by signals.
+
+    `primary_text` (title and author names) ranks above `secondary_text`
+    (description, publisher and genre names). The full-text index over it
+    is vendor specific, see myapp/search.py.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    primary_text = models.TextField(blank=True)
+    secondary_text = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Search document for {self.book_id}"
+
+class MediaBlob(models.Model):
+    """
+    A file stored by ContentAddressedStorage and how many references to it
+    exist, so shared files are only removed with their last reference.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refs = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
+
 class Review(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -89,7 +169,7 @@ class BookGenre(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.book.title} - {self.genre.name}"
+        return f"{self.books.title} - {self.genre.name}"
 
 class Order(models.Model):
     """
@@ -107,17 +187,32 @@ class Order(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=1, choices=ORDER_STATUS_CHOICES, default='P')
     ordered_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (ordered_date, id)
+            models.Index(fields=['ordered_date', 'id'], name='order_ordered_id_idx'),
+            # Backs a user's order history, newest first
+            models.Index(fields=['user', 'ordered_date', 'id'], name='order_user_ordered_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
     def calculate_total_price(self):
         """
-        Calculates the total price of the order based on the related OrderItem instances.
+        Calculates the total price of the order based on the related OrderItem
+        instances, in one aggregate query. Use `manage.py reprice_orders` for
+        many orders at once.
         """
-        total = sum(item.book.price * item.quantity for item in self.items.all())
+        total = self.items.aggregate(total=Sum(
+            F('book__price') * F('quantity'),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            default=Decimal('0.00'),
+        ))['total']
         self.total_price = total
-        self.save()
+        self.save(update_fields=['total_price', 'updated_at'])
         return total
 
 
@@ -131,3 +226,63 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.book.title} (x{self.quantity}) in Order #{self.order.id}"
+
+
+class BookSales(models.Model):
+    """
+    Units of a book ordered on one day, feeding the bestseller leaderboards.
+    Only the days of the longest window are kept, see myapp/leaderboards.py.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='booksales_book_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='booksales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.units} of book {self.book_id} on {self.day}"
+
+
+class BookRanking(models.Model):
+    """
+    A book's standing in one leaderboard scope: `all`, `genre:<id>` or
+    `publisher:<id>`. Rebuilt for the books with new activity by
+    myapp/leaderboards.py and read a page at a time through the indexes.
+    """
+    scope = models.CharField(max_length=32)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='rankings')
+    rating_score = models.FloatField()
+    rating_count = models.PositiveIntegerField(default=0)
+    units_7d = models.PositiveIntegerField(default=0)
+    units_30d = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'book'], name='bookranking_scope_book_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'rating_score', 'book'], name='ranking_rated_idx'),
+            models.Index(fields=['scope', 'units_7d', 'book'], name='ranking_sold_7d_idx'),
+            models.Index(fields=['scope', 'units_30d', 'book'], name='ranking_sold_30d_idx'),
+        ]
+
+    def __str__(self):
+        return f"Book {self.book_id} in {self.scope}"
+
+
+class LeaderboardState(models.Model):
+    """
+    How far the last leaderboard refresh got, a single row.
+    """
+    last_order_item = models.BigIntegerField(default=0)
+    last_review = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Leaderboards refreshed at {self.refreshed_at}"
@@ -0,0 +1,255 @@
+import os
+import time
+import random
+import logging
+import tempfile
+import threading
+import requests
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from .diskcache import PersistentCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = "key,title,author_name,editions,description"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULTS = {
+    'BASE_URL': 'https://openlibrary.org',
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'MAX_RETRIES': 2,
+    'BACKOFF': 0.5,
+    'RATE_LIMIT': 5,          # requests per second, per process
+    'BURST': 10,
+    'MAX_RATE_WAIT': 5,       # seconds to wait for a rate limit token
+    'FAILURE_THRESHOLD': 5,   # consecutive failures that open the circuit
+    'RESET_TIMEOUT': 30,      # seconds before a half-open trial request
+    'POOL_SIZE': 10,
+    # Successful responses are kept on disk; set CACHE_PATH to None to disable.
+    'CACHE_PATH': os.path.join(tempfile.gettempdir(), 'openlibrary-cache.sqlite3'),
+    'CACHE_TTL': 24 * 60 * 60,
+    'CACHE_MAX_ENTRIES': 10000,
+}
+
+
+class OpenLibraryError(Exception):
+    """
+    Open Library could not be reached or returned an unusable response.
+    """
+
+
+class OpenLibraryUnavailable(OpenLibraryError):
+    """
+    The request was not sent: the circuit is open or the rate limit was hit.
+    """
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket refilled at `rate` tokens per second.
+    """
+    def __init__(self, rate, burst, max_wait):
+        self.rate = rate
+        self.capacity = burst
+        self.max_wait = max_wait
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            if wait > self.max_wait:
+                self.tokens += 1
+                raise OpenLibraryUnavailable("Open Library rate limit exceeded.")
+        if wait:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    until `reset_timeout` has passed, then lets a single trial call through.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def release(self):
+        """
+        Hand back a trial call that was let through but never sent, so the
+        next caller can make it instead.
+        """
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Open Library circuit opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class OpenLibraryClient:
+    """
+    Open Library HTTP client with a pooled session, connect/read timeouts,
+    bounded retries with jittered exponential backoff, a client-side rate
+    limit and a circuit breaker.
+
+    Successful responses are cached on disk by normalised request, and
+    concurrent identical requests share a single upstream call.
+    """
+    def __init__(self, **options):
+        config = {**DEFAULTS, **options}
+        self.base_url = config['BASE_URL'].rstrip('/')
+        self.timeout = (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+        self.max_retries = config['MAX_RETRIES']
+        self.backoff = config['BACKOFF']
+        self.rate_limiter = RateLimiter(config['RATE_LIMIT'], config['BURST'], config['MAX_RATE_WAIT'])
+        self.breaker = CircuitBreaker(config['FAILURE_THRESHOLD'], config['RESET_TIMEOUT'])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['POOL_SIZE'], max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = 'django-practice/1.0 (catalogue enrichment)'
+
+        self.cache = None
+        if config['CACHE_PATH']:
+            self.cache = PersistentCache(config['CACHE_PATH'], config['CACHE_TTL'], config['CACHE_MAX_ENTRIES'])
+        self.in_flight = SingleFlight()
+
+    def search(self, query, fields=SEARCH_FIELDS):
+        return self.get_json('/search.json', {'q': normalise_query(query), 'fields': fields})
+
+    def get_json(self, path, params):
+        key = path + '?' + urlencode(sorted(params.items()))
+        if self.cache is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                return data
+        return self.in_flight.do(key, lambda: self.fetch_json(key, path, params))
+
+    def fetch_json(self, key, path, params):
+        if self.cache is not None:
+            # A previous leader may have filled the cache while we queued.
+            data = self.cache.get(key)
+            if data is not None:
+                return data
+        data = self.request_json(path, params)
+        if self.cache is not None:
+            self.cache.set(key, data)
+        return data
+
+    def request_json(self, path, params):
+        if not self.breaker.allow():
+            raise OpenLibraryUnavailable("Open Library is unavailable, try again later.")
+
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.rate_limiter.acquire()
+            except OpenLibraryUnavailable:
+                # Nothing was sent, so there is no outcome to record.
+                self.breaker.release()
+                raise
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES:
+                    raise requests.HTTPError(f"{response.status_code} from Open Library", response=response)
+                response.raise_for_status()
+                data = response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as exc:
+                status_code = getattr(exc.response, 'status_code', None)
+                if status_code is not None and status_code not in RETRY_STATUSES:
+                    # A 4xx means the request was wrong, not that upstream is unhealthy.
+                    self.breaker.record_success()
+                    raise OpenLibraryError(str(exc)) from exc
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                    continue
+                self.breaker.record_failure()
+                raise OpenLibraryError(str(exc)) from exc
+            except (requests.RequestException, ValueError) as exc:
+                self.breaker.record_failure()
+                raise OpenLibraryError(str(exc)) from exc
+            self.breaker.record_success()
+            return data
+
+
+def normalise_query(query):
+    """
+    Case- and whitespace-insensitive form of a search query, so trivially
+    different spellings share a cache entry.
+    """
+    return " ".join(query.split()).casefold()
+
+
+def extract_description(data):
+    """
+    Return the description of the first edition of the first search result,
+    or None when there are no results. Typed values such as
+    {"type": "/type/text", "value": "..."} are unwrapped.
+    """
+    if not data.get("docs"):
+        return None
+    editions = data["docs"][0].get("editions", {}).get("docs") or [{}]
+    description = editions[0].get("description", "")
+    if isinstance(description, dict):
+        description = description.get("value", "")
+    return description
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide client configured from settings.OPEN_LIBRARY.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenLibraryClient(**getattr(settings, 'OPEN_LIBRARY', {}))
+        return _client
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    global _client
+    if setting == 'OPEN_LIBRARY':
+        with _client_lock:
+            _client = None
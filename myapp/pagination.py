@@ -0,0 +1,288 @@
+import json
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Databases whose planner row estimates are read by estimate_count()
+ESTIMATE_VENDORS = ('postgresql',)
+
+
+def estimate_count(queryset):
+    """
+    PostgreSQL's row estimate for `queryset`, from EXPLAIN. For a whole
+    table it is pg_class.reltuples scaled to the table's current size,
+    filters are applied through the column statistics.
+    """
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(queryset, threshold=None):
+    """
+    Count `queryset` exactly up to `threshold` rows and estimate it past
+    that, without scanning the rest. Returns (count, approximate).
+    Databases without planner statistics (SQLite) always count exactly.
+    """
+    if threshold is None or connections[queryset.db].vendor not in ESTIMATE_VENDORS:
+        return queryset.count(), False
+    count = queryset.order_by()[:threshold + 1].count()
+    if count <= threshold:
+        return count, False
+    # Stale statistics can fall short of what was just counted
+    return max(estimate_count(queryset), count), True
+
+
+def estimate_threshold():
+    return getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', None)
+
+
+class EstimatedPage(Page):
+    more = None
+
+    def has_next(self):
+        if self.more is None:
+            return super().has_next()
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts big result sets from planner statistics.
+
+    Up to settings.ESTIMATED_COUNT_THRESHOLD rows the count is exact. Past
+    it `count` is an estimate and `approximate` is set; pages are then not
+    cut off at the estimated end, a page is served as long as it has rows
+    and has_next() looks one row ahead.
+    """
+    approximate = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        count, self.approximate = count_rows(self.object_list, estimate_threshold())
+        return count
+
+    def validate_number(self, number):
+        self.count
+        if not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.more = len(rows) > self.per_page
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedPage(*args, **kwargs)
+
+
+class CustomPagination(PageNumberPagination):
+    """
+    Page-number pagination whose `count` is estimated on large result sets,
+    flagged by `count_approximate`.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_approximate': self.page.paginator.approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering such as
+    `('published_date', 'id')`.
+
+    Each page is fetched with a `WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n`
+    style query, so deep pages cost the same as the first one as long as the
+    ordering is backed by an index. Cursors are opaque base64 tokens holding
+    the boundary row's ordering values. The total count is only computed when
+    the client asks for it with `?count=true`, and estimated like
+    CustomPagination's on large result sets.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if hasattr(view, 'get_keyset_ordering'):
+            self.ordering = tuple(view.get_keyset_ordering() or self.ordering)
+        else:
+            self.ordering = tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = self.count_approximate = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count, self.count_approximate = count_rows(queryset, estimate_threshold())
+
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position, reverse))
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, position is not None
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(name[1:] if name.startswith('-') else '-' + name for name in self.ordering)
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Expand the row comparison `(f1, f2, ...) > (v1, v2, ...)` into
+        `f1 >= v1 AND (f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...)`, honouring
+        the direction of each ordering field.
+
+        The OR chain alone gives the planner no range to start the index scan
+        from, so the leading `f1 >= v1` is what keeps deep pages cheap.
+        """
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            field = self.fields[index].name
+            clause = Q(**{f"{field}__{'lt' if descending else 'gt'}": position[index]})
+            for previous, value in zip(self.fields[:index], position[:index]):
+                clause &= Q(**{previous.name: value})
+            condition |= clause
+        descending = self.ordering[0].startswith('-') != reverse
+        bound = Q(**{f"{self.fields[0].name}__{'lte' if descending else 'gte'}": position[0]})
+        return bound & condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        payload = {'p': [field.value_to_string(row) for field in self.fields]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, 'count_approximate': self.count_approximate, **response}
+        return Response(response)
+
+
+class PaginationModeMixin:
+    """
+    Lets a viewset switch from page-number to keyset pagination per request.
+
+    Keyset mode is used when the request carries a `cursor`, or asks for it
+    with `?pagination=cursor`, and the viewset declares a `keyset_ordering`.
+    """
+    keyset_pagination_class = KeysetPagination
+    keyset_ordering = None
+    pagination_mode_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.use_keyset_pagination():
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def use_keyset_pagination(self):
+        if not self.get_keyset_ordering():
+            return False
+        params = self.request.query_params
+        return (
+            self.keyset_pagination_class.cursor_query_param in params
+            or params.get(self.pagination_mode_query_param) == 'cursor'
+        )
@@ -0,0 +1,84 @@
+"""
+Order totals computed by the database.
+
+`Order.calculate_total_price()` prices one order with an aggregate query.
+`reprice_orders()` recalculates many orders after a price correction,
+one UPDATE ... FROM (aggregate subquery) statement per batch of orders,
+instead of loading each order and its items.
+"""
+from decimal import Decimal
+from django.db import connection
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import bump_versions
+from .models import Book, Order, OrderItem
+
+REPRICE_BATCH_SIZE = 10000
+
+TOTAL_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+# Supported by Postgres and SQLite (3.33+). Orders without items are
+# priced at 0, unchanged totals are not rewritten.
+REPRICE_SQL = """
+    UPDATE {order} SET total_price = totals.total, updated_at = %s
+    FROM (
+        SELECT o.id AS order_id, ROUND(COALESCE(SUM(b.price * i.quantity), 0), 2) AS total
+        FROM {order} o
+        LEFT JOIN {item} i ON i.order_id = o.id
+        LEFT JOIN {book} b ON b.id = i.book_id
+        WHERE o.id IN ({orders})
+        GROUP BY o.id
+    ) AS totals
+    WHERE {order}.id = totals.order_id AND {order}.total_price <> totals.total
+"""
+
+
+def reprice_orders(queryset=None, batch_size=REPRICE_BATCH_SIZE):
+    """
+    Recalculate the total price of the orders in `queryset` (all orders by
+    default) from the current book prices. Works through them in pk order,
+    one statement and one short transaction per `batch_size` orders.
+    Returns the number of orders whose total changed.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    updated = 0
+    last = 0
+    while True:
+        batch = queryset.filter(pk__gt=last)
+        end = list(ids.filter(pk__gt=last)[batch_size - 1:batch_size])
+        if end:
+            batch = batch.filter(pk__lte=end[0])
+        updated += _reprice(batch)
+        if not end:
+            break
+        last = end[0]
+    if updated:
+        bump_versions(Order)
+    return updated
+
+
+def _reprice(orders):
+    now = timezone.now()
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        # No UPDATE ... FROM, a correlated subquery does the same per row.
+        totals = (
+            OrderItem.objects.filter(order=OuterRef('pk'))
+            .values('order').annotate(total=Sum(F('book__price') * F('quantity'), output_field=TOTAL_FIELD))
+            .values('total')
+        )
+        return orders.update(total_price=Coalesce(Subquery(totals), Decimal('0.00')), updated_at=now)
+
+    orders_sql, orders_params = orders.values('pk').query.sql_with_params()
+    quote = connection.ops.quote_name
+    sql = REPRICE_SQL.format(
+        order=quote(Order._meta.db_table),
+        item=quote(OrderItem._meta.db_table),
+        book=quote(Book._meta.db_table),
+        orders=orders_sql,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [connection.ops.adapt_datetimefield_value(now), *orders_params])
+        return cursor.rowcount
@@ -0,0 +1,75 @@
+import logging
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a view runs more queries than its budget allows and
+    QUERY_BUDGET_STRICT is enabled.
+    """
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts the queries run through it while
+    `active` is set.
+    """
+    def __init__(self):
+        self.active = False
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            self.count += 1
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Enforces a per-action query budget on a viewset.
+
+    `query_budgets` maps an action name to the maximum number of queries the
+    handler may run, not counting authentication and permission checks.
+    Going over budget logs a warning, or raises QueryBudgetExceeded when
+    settings.QUERY_BUDGET_STRICT is true (the test suite turns it on).
+    """
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        # The wrapper is removed however the handler exits, even when it
+        # raises something that never reaches finalize_response().
+        self._query_counter = QueryCounter()
+        with connection.execute_wrapper(self._query_counter):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.get_query_budget() is not None:
+            self._query_counter.active = True
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        counter = getattr(self, '_query_counter', None)
+        if counter is not None and counter.active:
+            counter.active = False
+            self.check_query_budget(counter)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_query_budget(self):
+        return self.query_budgets.get(self.action)
+
+    def check_query_budget(self, counter):
+        budget = self.get_query_budget()
+        if counter.count <= budget:
+            return
+        message = (
+            f"{self.__class__.__name__}.{self.action} ran {counter.count} queries, "
+            f"budget is {budget}:\n" + "\n".join(counter.queries)
+        )
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,117 @@
+"""
+Review aggregates kept on Book.
+
+Every review write adjusts its book's rating_count, rating_sum, per-star
+counts and Bayesian rating_score with a single UPDATE of F() expressions,
+so concurrent reviews never lose an update, and showing or sorting by
+rating never has to read the reviews table. `reconcile_ratings()`
+recomputes the aggregates from the reviews in bulk.
+"""
+import math
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from .cache import bump_versions
+from .models import Book, Review
+from .streaming import iter_chunks
+
+HISTOGRAM_FIELDS = {stars: f'rating_count_{stars}' for stars in range(1, 6)}
+RATING_FIELDS = ('rating_count', 'rating_sum', *HISTOGRAM_FIELDS.values(), 'rating_score')
+RECONCILE_BATCH_SIZE = 1000
+
+
+def bayesian_score(rating_sum, rating_count):
+    """
+    (prior weight * prior mean + sum) / (prior weight + count), for numbers
+    as well as expressions.
+    """
+    weight = getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+    mean = getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+    return (float(weight * mean) + rating_sum) / (float(weight) + rating_count)
+
+
+def apply_rating_change(removed=None, added=None):
+    """
+    Update the aggregates for a review that went away and/or came in, each
+    given as (book id, stars). One UPDATE per book touched.
+    """
+    changes = {}
+    for review, sign in ((removed, -1), (added, 1)):
+        if review is not None:
+            book_id, stars = review
+            histogram = changes.setdefault(book_id, {})
+            histogram[stars] = histogram.get(stars, 0) + sign
+
+    updated = False
+    for book_id, histogram in changes.items():
+        histogram = {stars: delta for stars, delta in histogram.items() if delta}
+        if not histogram:
+            continue
+        count = sum(histogram.values())
+        total = sum(stars * delta for stars, delta in histogram.items())
+        Book.objects.filter(pk=book_id).update(
+            rating_count=F('rating_count') + count,
+            rating_sum=F('rating_sum') + total,
+            # SET expressions all read the old row
+            rating_score=bayesian_score(F('rating_sum') + total, F('rating_count') + count),
+            updated_at=timezone.now(),
+            **{HISTOGRAM_FIELDS[stars]: F(HISTOGRAM_FIELDS[stars]) + delta for stars, delta in histogram.items()},
+        )
+        updated = True
+    if updated:
+        # update() sends no post_save
+        bump_versions(Book)
+
+
+def rating_summary(book):
+    return {
+        'count': book.rating_count,
+        'average': round(book.rating_sum / book.rating_count, 2) if book.rating_count else None,
+        'score': round(book.rating_score, 3),
+        'histogram': {str(stars): getattr(book, field) for stars, field in HISTOGRAM_FIELDS.items()},
+    }
+
+
+def reconcile_ratings(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recompute the aggregates of every book from its reviews, a batch of
+    books at a time: one grouped query over their reviews and one bulk
+    update of the books that were off. Returns the number of books fixed.
+    """
+    fixed = 0
+    for books in iter_chunks(Book.objects.only('id', *RATING_FIELDS), chunk_size=batch_size):
+        rows = (
+            Review.objects.filter(book_id__gte=books[0].pk, book_id__lte=books[-1].pk)
+            .values('book').order_by()
+            .annotate(
+                count=Count('id'),
+                total=Sum('rating'),
+                **{field: Count('id', filter=Q(rating=stars)) for stars, field in HISTOGRAM_FIELDS.items()},
+            )
+        )
+        aggregates = {row['book']: row for row in rows}
+        changed = []
+        for book in books:
+            row = aggregates.get(book.pk, {})
+            expected = {
+                'rating_count': row.get('count', 0),
+                'rating_sum': row.get('total') or 0,
+                **{field: row.get(field, 0) for field in HISTOGRAM_FIELDS.values()},
+            }
+            expected['rating_score'] = bayesian_score(expected['rating_sum'], expected['rating_count'])
+            if _differs(book, expected):
+                for field, value in expected.items():
+                    setattr(book, field, value)
+                changed.append(book)
+        Book.objects.bulk_update(changed, RATING_FIELDS)
+        fixed += len(changed)
+    if fixed:
+        bump_versions(Book)
+    return fixed
+
+
+def _differs(book, expected):
+    return any(
+        not math.isclose(book.rating_score, value) if field == 'rating_score' else getattr(book, field) != value
+        for field, value in expected.items()
+    )
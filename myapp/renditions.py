@@ -0,0 +1,158 @@
+"""
+Resized WebP renditions of book covers.
+
+Decoding and encoding run in a process pool, so neither the request that
+uploaded a cover nor other threads wait on Pillow. This module is imported
+by the pool workers, keep its top-level imports free of models.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from .storage import release_files
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height). Covers are scaled down to fit, never up.
+RENDITIONS = {
+    'thumbnail': (160, 240),
+    'card': (320, 480),
+    'full': (800, 1200),
+}
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+RENDITIONS_DIR = 'covers/renditions'
+
+
+def render(data, renditions=RENDITIONS):
+    """
+    Decode an image once and return {name: (webp bytes, width, height)}
+    for every rendition. Runs in a pool worker.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        results = {}
+        for name, size in renditions.items():
+            variant = image.copy()
+            variant.thumbnail(size, Image.LANCZOS)
+            output = io.BytesIO()
+            variant.save(output, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+            results[name] = (output.getvalue(), variant.width, variant.height)
+    return results
+
+
+_pool = None
+_dispatcher = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'RENDITION_WORKERS', None))
+        return _pool
+
+
+def get_dispatcher():
+    """
+    Threads that read covers, wait for the process pool and save the
+    results, off the request thread.
+    """
+    global _dispatcher
+    with _pool_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+        return _dispatcher
+
+
+def needs_renditions(book):
+    return bool(book.cover_photo) and book.cover_renditions.get('source') != book.cover_photo.name
+
+
+def rendition_names(renditions):
+    return [rendition['name'] for name, rendition in renditions.items() if name in RENDITIONS]
+
+
+def save_renditions(book, rendered):
+    """
+    Store rendered variants and record them on the book, unless its cover
+    was replaced in the meantime. The files they replace are released.
+    """
+    from .cache import bump_versions
+    from .models import Book
+
+    storage = book.cover_photo.storage
+    renditions = {'source': book.cover_photo.name}
+    for name, (content, width, height) in rendered.items():
+        # The covers storage names files by content, so identical covers
+        # share their renditions.
+        path = storage.save(f"{RENDITIONS_DIR}/{name}.webp", ContentFile(content))
+        renditions[name] = {'name': path, 'width': width, 'height': height}
+
+    updated = Book.objects.filter(pk=book.pk, cover_photo=book.cover_photo.name).update(cover_renditions=renditions)
+    if not updated:
+        release_files(storage, rendition_names(renditions))
+        return None
+    release_files(storage, rendition_names(book.cover_renditions))
+    book.cover_renditions = renditions
+    bump_versions(Book)
+    return renditions
+
+
+def read_cover(book):
+    with book.cover_photo.open('rb') as f:
+        return f.read()
+
+
+def generate_renditions(book):
+    """
+    Render and store the renditions of one book's cover, in the pool.
+    """
+    return save_renditions(book, get_pool().submit(render, read_cover(book)).result())
+
+
+def _generate_in_background(book_id):
+    from .models import Book
+
+    close_old_connections()
+    try:
+        book = Book.objects.filter(pk=book_id).first()
+        if book is not None and needs_renditions(book):
+            generate_renditions(book)
+    except Exception:
+        logger.exception("Could not render the cover of book %s", book_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(book):
+    """
+    Render the book's cover in the background once the current transaction
+    has committed.
+    """
+    if needs_renditions(book):
+        transaction.on_commit(lambda: get_dispatcher().submit(_generate_in_background, book.pk))
+
+
+def rendition_urls(book, request=None):
+    """
+    Return {name: {url, width, height}} for the book's stored renditions.
+    """
+    storage = book.cover_photo.storage
+    urls = {}
+    for name in RENDITIONS:
+        rendition = book.cover_renditions.get(name)
+        if not rendition:
+            continue
+        url = storage.url(rendition['name'])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls[name] = {'url': url, 'width': rendition['width'], 'height': rendition['height']}
+    return urls
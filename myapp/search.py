@@ -0,0 +1,141 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from myapp.models import Book, BookSearchDocument
+
+DOCUMENT_TABLE = BookSearchDocument._meta.db_table
+FTS_TABLE = f"{DOCUMENT_TABLE}_fts"
+
+# Must stay identical to the expression indexed in migration 0013, otherwise
+# PostgreSQL will not use the GIN index.
+PG_VECTOR_SQL = (
+    "(setweight(to_tsvector('english'::regconfig, coalesce(primary_text, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(secondary_text, '')), 'B'))"
+)
+
+
+def tokenize(terms):
+    """
+    Split search terms into plain word tokens, dropping any query syntax.
+    """
+    return [token.lower() for term in terms for token in re.findall(r'\w+', term)]
+
+
+def build_document(book):
+    """
+    Build an unsaved BookSearchDocument for a book whose publisher, authors
+    and genres are already loaded.
+    """
+    authors = " ".join(f"{author.first_name} {author.last_name}" for author in book.authors.all())
+    genres = " ".join(genre.name for genre in book.genres.all())
+    return BookSearchDocument(
+        book=book,
+        primary_text=f"{book.title} {authors}".strip(),
+        secondary_text=" ".join(filter(None, [book.description, book.publisher.name, genres])),
+    )
+
+
+def refresh_documents(book_ids, batch_size=500):
+    """
+    Rebuild the search documents of the given books in bulk.
+    """
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), batch_size):
+        books = (
+            Book.objects.filter(pk__in=book_ids[start:start + batch_size])
+            .select_related('publisher')
+            .prefetch_related('authors', 'genres')
+        )
+        BookSearchDocument.objects.bulk_create(
+            [build_document(book) for book in books],
+            update_conflicts=True,
+            unique_fields=['book'],
+            update_fields=['primary_text', 'secondary_text'],
+        )
+
+
+class BaseSearchBackend:
+    """
+    Filters a Book queryset down to the books matching the search terms and
+    annotates each with `search_rank`, where higher ranks better.
+    """
+    def search(self, queryset, terms):
+        tokens = tokenize(terms)
+        if not tokens:
+            return queryset.none()
+        queryset = self.filter(queryset, tokens)
+        return queryset.order_by('-search_rank', 'pk')
+
+    def filter(self, queryset, tokens):
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector search over the GIN expression index on the search documents,
+    ranked with ts_rank.
+    """
+    def filter(self, queryset, tokens):
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        matches = RawSQL(
+            f"SELECT book_id FROM {DOCUMENT_TABLE} "
+            f"WHERE {PG_VECTOR_SQL} @@ to_tsquery('english'::regconfig, %s)",
+            [tsquery],
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank({PG_VECTOR_SQL}, to_tsquery('english'::regconfig, %s)) "
+            f"FROM {DOCUMENT_TABLE} WHERE book_id = {Book._meta.db_table}.id",
+            [tsquery],
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 search over an external-content table that triggers keep in sync
+    with the search documents, ranked with bm25.
+    """
+    def filter(self, queryset, tokens):
+        query = " ".join(f'"{token}"*' for token in tokens)
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query])
+        # bm25() is lower for better matches, so negate it.
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {Book._meta.db_table}.id",
+            [query],
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """
+    Unindexed fallback for other databases: every token must appear
+    somewhere in the search document.
+    """
+    def filter(self, queryset, tokens):
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(search_document__primary_text__icontains=token)
+                | Q(search_document__secondary_text__icontains=token)
+            )
+        return queryset.annotate(search_rank=RawSQL("0", []))
+
+
+VENDOR_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    """
+    Return the backend named by settings.BOOK_SEARCH_BACKEND, or the one
+    matching the default database.
+    """
+    path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, ContainsSearchBackend)()
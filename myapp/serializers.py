@@ -1,5 +1,11 @@
 from rest_framework import serializers
-from .models import Book, Order, Genre, Author, Publisher, Review
+from collections import Counter
+from django.db import transaction
+from .cache import bump_versions
+from .inventory import InsufficientStock, available_stock, decrement_stock, set_stock_shards
+from .models import Book, Order, OrderItem, Genre, Author, Publisher, Review
+from .ratings import RATING_FIELDS, rating_summary
+from .renditions import rendition_urls
 from django.contrib.auth.models import User
 from djoser.serializers import UserCreateSerializer
 from django.contrib.auth.password_validation import validate_password
@@ -17,28 +23,45 @@ class BookSerializer(serializers.ModelSerializer):
             data['published_date'] = instance.published_date.strftime('%B %d, %Y')
         
         data['price'] = f"${instance.price:.2f}"
+        # Adds up the shards of sharded stock
+        data['stock_quantity'] = available_stock(instance)
+
+        # Kept on the book by myapp/ratings.py, no need to read the reviews
+        for field in RATING_FIELDS:
+            data.pop(field, None)
+        data['rating'] = rating_summary(instance)
         
-        if instance.publisher:
-            data['publisher'] = {
-                "id": instance.publisher.id,
-                "name": instance.publisher.name
-            }
-        
-        if instance.authors:
-            data['publisher'] = {
-                "id": instance.publisher.id,
-                "name": instance.publisher.name
-            }
-        if instance.authors.exists():
-            data['authors'] = [
-                {
-                    "id": author.id,
-                    "name": author.first_name+" "+author.last_name
-                } for author in instance.authors.all()
-            ]
+        # Relies on the view's select_related/prefetch_related, so that no
+        # extra queries run per book.
+        data['publisher'] = {
+            "id": instance.publisher.id,
+            "name": instance.publisher.name
+        }
+        data['authors'] = [
+            {
+                "id": author.id,
+                "name": author.first_name+" "+author.last_name
+            } for author in instance.authors.all()
+        ]
+
+        # Resized covers, so list views can use the thumbnail or card
+        # instead of downloading the original.
+        renditions = rendition_urls(instance, self.context.get('request'))
+        data['cover_renditions'] = renditions
+        data['cover_srcset'] = ", ".join(
+            f"{rendition['url']} {rendition['width']}w" for rendition in renditions.values()
+        )
 
         return data
 
+    def update(self, instance, validated_data):
+        # Sharded stock is written through its shards, see myapp/inventory.py
+        if instance.stock_shard_count and 'stock_quantity' in validated_data:
+            instance.stock_quantity = set_stock_shards(
+                instance.pk, instance.stock_shard_count, validated_data.pop('stock_quantity')
+            )
+        return super().update(instance, validated_data)
+
     def get_in_stock(self,obj):
         return obj.stock_quantity > 0
 
@@ -55,26 +78,48 @@ class OrderSerializer(serializers.ModelSerializer):
  
     def create(self, validated_data):
         books = validated_data.pop('books', [])  # Extract books from the payload
+        # A book listed n times is ordered n times
+        quantities = Counter(book.pk for book in books)
+
+        with transaction.atomic():
+            # Checks and decrements stock atomically, see myapp/inventory.py
+            try:
+                decrement_stock(quantities)
+            except InsufficientStock as e:
+                raise serializers.ValidationError([
+                    f"Insufficient stock for '{book.title}'. Only {available} available."
+                    for book, available in e.shortages.items()
+                ])
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, book_id=pk, quantity=quantity) for pk, quantity in quantities.items()
+            ])
+            # bulk_create sends no post_save
+            bump_versions(OrderItem)
+            # Priced by the database, from the prices at the time of the order
+            order.calculate_total_price()
+        return order
+
 
-        # Validate stock for each book
-        for book in books:
-            if book.stock_quantity < 1:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for '{book.title}'. Only {book.stock_quantity} available."
-                )
-        # Calculate the total price of the order
-        total_price = sum(book.price for book in books)
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='book.title')
+    price = serializers.DecimalField(source='book.price', max_digits=10, decimal_places=2)
 
-        order = Order.objects.create(total_price=total_price, **validated_data)
+    class Meta:
+        model = OrderItem
+        fields = ('book', 'title', 'price', 'quantity')
 
-        # Decrement stock quantity for each book and save
-        for book in books:
-            book.stock_quantity -= 1
-            book.save()
 
-        # Associate books with the order
-        order.books.set(books)
-        return order
+class OrderHistorySerializer(serializers.ModelSerializer):
+    """
+    An order with its items, read from `items` prefetched with their books
+    rather than the `books` relation.
+    """
+    items = OrderHistoryItemSerializer(many=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'status', 'ordered_date', 'updated_at', 'total_price', 'items')
 
 
 class GenreSerializer(serializers.ModelSerializer):
@@ -111,4 +156,37 @@ class BookSummarySerializer(serializers.Serializer):
         return [{"id": author.id, "name": author.first_name} for author in obj.authors.all()]
 
     def get_summary(self, obj):
-        return f"{obj.title} by {', '.join(author.first_name for author in obj.authors.all())}" if obj.authors.exists() else obj.title
\ No newline at end of file
+        authors = obj.authors.all()
+        return f"{obj.title} by {', '.join(author.first_name for author in authors)}" if authors else obj.title
+
+
+class BookBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One book of a bulk create. Related objects are given by id and checked
+    against the sets of existing ids in the context, which the view loads
+    once for the whole batch instead of once per book.
+    """
+    publisher = serializers.IntegerField()
+    authors = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    genres = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    class Meta:
+        model = Book
+        fields = ('title', 'published_date', 'price', 'stock_quantity', 'description', 'publisher', 'authors', 'genres')
+
+    def validate_publisher(self, value):
+        if value not in self.context['publisher_ids']:
+            raise serializers.ValidationError(f"Publisher {value} does not exist.")
+        return value
+
+    def validate_authors(self, value):
+        return self.check_ids(value, self.context['author_ids'], "Author")
+
+    def validate_genres(self, value):
+        return self.check_ids(value, self.context['genre_ids'], "Genre")
+
+    def check_ids(self, value, existing, label):
+        missing = [pk for pk in value if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(f"{label} {', '.join(map(str, missing))} does not exist.")
+        return list(dict.fromkeys(value))
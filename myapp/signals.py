@@ -0,0 +1,140 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .cache import bump_versions
+from .models import Author, Book, BookGenre, Genre, Order, OrderItem, Publisher, Review
+from .ratings import apply_rating_change
+from .renditions import rendition_names, schedule_renditions
+from .search import refresh_documents
+from .storage import release_files
+
+VERSIONED_MODELS = (Book, Author, Genre, Publisher, BookGenre, Review, Order, OrderItem)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_documents([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def render_cover(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_renditions(instance)
+
+
+@receiver(pre_save, sender=Book)
+def remember_cover(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._previous_cover = Book.objects.filter(pk=instance.pk).values_list('cover_photo', flat=True).first()
+
+
+@receiver(post_save, sender=Book)
+def release_replaced_cover(sender, instance, raw=False, **kwargs):
+    """
+    Drop the storage reference of a cover that was replaced. Its stale
+    renditions are released when the new ones are saved.
+    """
+    previous = getattr(instance, '_previous_cover', None)
+    if not raw and previous and previous != instance.cover_photo.name:
+        release_files(instance.cover_photo.storage, [previous])
+
+
+@receiver(post_delete, sender=Book)
+def release_cover(sender, instance, **kwargs):
+    if instance.cover_photo:
+        release_files(instance.cover_photo.storage, [instance.cover_photo.name] + rendition_names(instance.cover_renditions))
+
+
+@receiver(pre_save, sender=Review)
+def remember_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('book_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_rating(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep the book's rating aggregates in step, also when a review moves to
+    another book or changes its rating.
+    """
+    if not raw:
+        previous = None if created else getattr(instance, '_previous_rating', None)
+        apply_rating_change(removed=previous, added=(instance.book_id, instance.rating))
+
+
+@receiver(post_delete, sender=Review)
+def uncount_rating(sender, instance, **kwargs):
+    apply_rating_change(removed=(instance.book_id, instance.rating))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def index_book_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Reindex after authors or genres are added to or removed from books,
+    from either side of the relation.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_documents([instance.pk])
+    elif pk_set:
+        refresh_documents(pk_set)
+    else:
+        # Cleared from the author/genre side: the affected books are gone
+        # from the relation, so fall back to the ids stashed in pre_clear.
+        refresh_documents(getattr(instance, '_search_book_ids', []))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def remember_cleared_books(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._search_book_ids = list(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=BookGenre)
+@receiver(post_delete, sender=BookGenre)
+def index_book_genre(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_documents([instance.books_id])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Publisher)
+def index_related_books(sender, instance, created, raw=False, **kwargs):
+    """
+    Author, genre and publisher names are part of their books' documents.
+    """
+    if not created and not raw:
+        refresh_documents(instance.books.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def remember_related_books(sender, instance, **kwargs):
+    instance._search_book_ids = list(instance.books.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def reindex_related_books(sender, instance, **kwargs):
+    refresh_documents(getattr(instance, '_search_book_ids', []))
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    bump_versions(sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache-save-{model._meta.label_lower}")
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache-delete-{model._meta.label_lower}")
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+@receiver(m2m_changed, sender=Order.books.through)
+def invalidate_cached_relations(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions(sender)
@@ -0,0 +1,93 @@
+import os
+import hashlib
+import logging
+import tempfile
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files after the sha256 of their content.
+
+    Uploads are streamed to a temporary file and hashed on the way, then
+    moved to `<upload dir>/<h[:2]>/<h[2:4]>/<h>.<ext>`. The two shard
+    levels keep every directory small. Byte-identical uploads end up as one
+    file, and a MediaBlob row counts the references to it. delete() drops a
+    reference and removes the file with the last one.
+    """
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content in _save().
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.path(directory or '.'), exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        # Same directory as the target, so the final move is an atomic rename.
+        fd, tmp_path = tempfile.mkstemp(dir=self.path(directory or '.'), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = "/".join(filter(None, [directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension]))
+            with transaction.atomic():
+                blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                    name=name, defaults={'size': size, 'refs': 1},
+                )
+                if created or not self.exists(name):
+                    full_path = self.path(name)
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(tmp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+                if not created:
+                    MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') + 1)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Not stored by this backend (e.g. a pre-migration flat
+                # upload); it may still be referenced, so leave it.
+                logger.debug("Not deleting untracked media file %s", name)
+                return
+            if blob.refs > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+def cover_storage():
+    return storages['covers']
+
+
+def release_files(storage, names):
+    """
+    Delete `names` from `storage` once the current transaction commits.
+    With ContentAddressedStorage this only drops one reference each.
+    """
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: [storage.delete(name) for name in names])
@@ -0,0 +1,63 @@
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import prefetch_related_objects
+
+
+def iter_chunks(queryset, chunk_size=500, prefetch=()):
+    """
+    Yield the rows of a queryset as lists of at most `chunk_size` objects.
+
+    Each chunk is its own `WHERE pk > last ORDER BY pk LIMIT n` query, so
+    memory use does not grow with the table and no server-side cursor has
+    to be held open while the response is streamed. `prefetch` lookups are
+    resolved once per chunk.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        if prefetch:
+            prefetch_related_objects(chunk, *prefetch)
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def _dumps(item):
+    return json.dumps(item, cls=DjangoJSONEncoder)
+
+
+def ndjson_stream(chunks, serialize):
+    """
+    Render each chunk with `serialize` (a callable returning a list of
+    dicts) as newline-delimited JSON.
+    """
+    for chunk in chunks:
+        items = serialize(chunk)
+        if items:
+            yield "".join(_dumps(item) + "\n" for item in items)
+
+
+def json_array_stream(chunks, serialize):
+    """
+    Render each chunk with `serialize` as part of a single JSON array that
+    is written incrementally.
+    """
+    yield "["
+    separator = ""
+    for chunk in chunks:
+        items = serialize(chunk)
+        if items:
+            yield separator + ",".join(_dumps(item) for item in items)
+            separator = ","
+    yield "]"
+
+
+STREAM_FORMATS = {
+    'ndjson': (ndjson_stream, 'application/x-ndjson'),
+    'json': (json_array_stream, 'application/json'),
+}
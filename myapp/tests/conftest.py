@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(settings):
+    """Make query budget overruns fail the test instead of logging a warning."""
+    settings.QUERY_BUDGET_STRICT = True
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings, tmp_path):
+    """Use a cache shared between processes, as production must."""
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path / "cache"),
+        }
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(shared_cache):
+    """Start every test with an empty cache, the database is reset too."""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def open_library_cache(settings, tmp_path):
+    """Give every test its own, empty Open Library response cache."""
+    settings.OPEN_LIBRARY = {**settings.OPEN_LIBRARY, "CACHE_PATH": str(tmp_path / "openlibrary.sqlite3")}
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Keep uploaded files out of the project's media directory."""
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    return tmp_path / "media"
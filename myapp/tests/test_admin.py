@@ -1,7 +1,10 @@
 import pytest
 from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from myapp.tests.factories import BookFactory
+from myapp.models import Review
+from myapp.tests.factories import AuthorFactory, BookFactory, GenreFactory, OrderFactory, OrderItemFactory, PublisherFactory, UserFactory
 
 @pytest.mark.django_db
 class TestAdminFilters:
@@ -72,3 +75,51 @@ class TestAdminFilters:
         queryset = response.context['cl'].queryset
         assert queryset.count() == 1
 
+
+
+def changelist_queries(client, model):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse(f'admin:myapp_{model}_changelist'))
+    assert response.status_code == 200
+    return len(queries)
+
+
+def add_rows(start, count):
+    """
+    `count` books published today, each with an author, a genre, a review
+    and an order item from a user of its own.
+    """
+    for n in range(start, start + count):
+        book = BookFactory(published_date=date.today(), cover_photo="", publisher=PublisherFactory(name=f"Press {n}"))
+        book.authors.add(AuthorFactory())
+        book.genres.add(GenreFactory(name=f"Genre {n}"))
+        user = UserFactory()
+        Review.objects.create(book=book, user=user, review_text="Fine", rating=4)
+        OrderItemFactory(order=OrderFactory(user=user, status="P"), book=book)
+
+
+@pytest.mark.django_db
+class TestAdminChangelists:
+    @pytest.mark.parametrize("model", ["book", "author", "review", "order", "orderitem", "bookgenre"])
+    def test_queries_do_not_grow_with_rows(self, admin_client, model):
+        add_rows(0, 2)
+        few = changelist_queries(admin_client, model)
+        add_rows(2, 5)
+        assert changelist_queries(admin_client, model) == few
+
+    def test_book_autocomplete_searches_every_year(self, admin_client):
+        old = BookFactory(title="Old Dune", published_date=date(1965, 8, 1), cover_photo="")
+        response = admin_client.get(reverse('admin:autocomplete'), {
+            'term': 'Dune', 'app_label': 'myapp', 'model_name': 'review', 'field_name': 'book',
+        })
+        assert response.status_code == 200
+        assert [result['id'] for result in response.json()['results']] == [str(old.pk)]
+
+    def test_orders_are_searched_by_user(self, admin_client):
+        order = OrderFactory(user=UserFactory(username="reader42"), status="P")
+        OrderFactory(user=UserFactory(username="someone"), status="P")
+        url = reverse('admin:myapp_order_changelist')
+        response = admin_client.get(url, {'q': 'reader42'})
+        assert list(response.context['cl'].queryset) == [order]
+        response = admin_client.get(url, {'q': str(order.pk)})
+        assert list(response.context['cl'].queryset) == [order]
@@ -1,10 +1,14 @@
-import os
+import io
+import json
 import pytest
 from unittest import mock
 import requests
+from PIL import Image
 from myapp.models import Book
-from django.conf import settings
+from myapp.querybudget import QueryBudgetExceeded
+from myapp.views import BookViewSet
 from rest_framework.test import APIClient
+from django.db import connection
 from django.urls import reverse
 from datetime import timedelta, date
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -57,18 +61,62 @@ def test_retrieve_book(auth_client, create_books, api_client):
     assert response.status_code == 404
 
 
+def test_list_books_query_count_is_constant(auth_client, django_assert_max_num_queries):
+    """The list endpoint runs the same number of queries for any page size."""
+    authors = AuthorFactory.create_batch(3)
+    genres = [GenreFactory(name="Fantasy"), GenreFactory(name="Adventure")]
+    # one publisher: twenty fake company names can collide on the unique name
+    publisher = PublisherFactory(name="Test Publisher")
+    for book in BookFactory.create_batch(20, publisher=publisher):
+        book.authors.set(authors)
+        book.genres.set(genres)
+
+    # one extra query authenticates the JWT user
+    for page_size in (5, 20):
+        with django_assert_max_num_queries(5):
+            response = auth_client.get(reverse("book-list") + f"?page_size={page_size}")
+        assert response.status_code == 200
+        assert len(response.data["results"]) == page_size
+        assert len(response.data["results"][0]["authors"]) == 3
+        assert len(response.data["results"][0]["genres"]) == 2
+
+
+def test_retrieve_book_query_count(auth_client, create_books, django_assert_max_num_queries):
+    """The detail endpoint stays within its query budget."""
+    with django_assert_max_num_queries(5):
+        response = auth_client.get(reverse("book-detail", args=[create_books[0].id]))
+    assert response.status_code == 200
+
+
+def test_query_budget_exceeded_fails_loudly(auth_client, create_books, monkeypatch):
+    """Going over the budget raises while QUERY_BUDGET_STRICT is on."""
+    monkeypatch.setattr(BookViewSet, "query_budgets", {"list": 1})
+    with pytest.raises(QueryBudgetExceeded):
+        auth_client.get(reverse("book-list"))
+
+
+def test_query_counter_is_removed_when_the_view_raises(auth_client, create_books, monkeypatch):
+    """An unhandled error does not leave the counter on the connection."""
+    def explode(self, request, *args, **kwargs):
+        Book.objects.count()
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(BookViewSet, "list", explode)
+    wrappers = list(connection.execute_wrappers)
+    with pytest.raises(RuntimeError):
+        auth_client.get(reverse("book-list"))
+    assert connection.execute_wrappers == wrappers
+
+
 def test_create_book(auth_client, api_client):
     """Test creating a new book (success and failure)"""
     publisher = PublisherFactory()
     author = AuthorFactory()
     genre = GenreFactory()
 
-    file_path = os.path.join(settings.BASE_DIR, 'media', 'covers', 'example.jpg')
-
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"{file_path} not found")
-    with open(file_path, 'rb') as img:
-        cover_photo = SimpleUploadedFile("example.jpg", img.read(), content_type="image/jpeg")
+    image = io.BytesIO()
+    Image.new("RGB", (100, 150), "navy").save(image, "JPEG")
+    cover_photo = SimpleUploadedFile("example.jpg", image.getvalue(), content_type="image/jpeg")
 
     payload = {
         "title": "New Test Book",
@@ -205,11 +253,57 @@ def test_combined_filters(auth_client):
     assert len(response.data["results"]) == 1
     assert response.data["results"][0]["title"] == "Advanced Django"
 
+@pytest.fixture
+def books_with_authors():
+    """Books that each have one author attached."""
+    books = BookFactory.create_batch(5)
+    for book in books:
+        book.authors.add(AuthorFactory(first_name="Stephen"))
+    return books
+
+
+def test_summary(auth_client, books_with_authors):
+    """The summary lists every book with its authors, in the streamed order."""
+    response = auth_client.get(reverse("book-summary"))
+    assert response.status_code == 200
+    assert [row["title"] for row in response.data] == [book.title for book in books_with_authors]
+    assert response.data[0]["summary"] == books_with_authors[0].title + " by Stephen"
+
+
+def test_summary_stream_ndjson(auth_client, books_with_authors, monkeypatch, django_assert_max_num_queries):
+    """NDJSON streaming emits one line per book, two queries per chunk."""
+    monkeypatch.setattr(BookViewSet, "summary_chunk_size", 2)
+
+    response = auth_client.get(reverse("book-summary") + "?stream=ndjson")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    # 3 chunks of books, each with its authors prefetched
+    with django_assert_max_num_queries(6):
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+    rows = [json.loads(line) for line in lines]
+    assert [row["title"] for row in rows] == [book.title for book in books_with_authors]
+    assert rows[0]["authors"] == [{"id": books_with_authors[0].authors.get().id, "name": "Stephen"}]
+
+
+def test_summary_stream_json(auth_client, books_with_authors, monkeypatch):
+    """JSON streaming writes a single array."""
+    monkeypatch.setattr(BookViewSet, "summary_chunk_size", 2)
+
+    response = auth_client.get(reverse("book-summary") + "?stream=json")
+    assert response.status_code == 200
+    rows = json.loads(b"".join(response.streaming_content))
+    assert len(rows) == len(books_with_authors)
+
+    response = auth_client.get(reverse("book-summary") + "?stream=xml")
+    assert response.status_code == 400
+
+
 @pytest.fixture
 def mock_open_library_response(mocker):
     """Fixture to mock the Open Library API response."""
 
-    return mocker.patch("requests.get", return_value=mock.Mock(status_code=200, json=lambda: mock_open_library_response_data))
+    return mocker.patch("requests.Session.get", return_value=mock.Mock(status_code=200, json=lambda: mock_open_library_response_data))
 
 @pytest.fixture
 def existing_book(db):
@@ -244,4 +338,16 @@ def test_open_library_missing_query(auth_client):
     """Test the 'open_library' action when the query parameter is missing."""
     response = auth_client.get(reverse("book-search-details"))
     assert response.status_code == 400
-    assert response.data["error"] == "Query parameter is required."
\ No newline at end of file
+    assert response.data["error"] == "Query parameter is required."
+
+def test_search_details_upstream_down(mocker, settings, auth_client):
+    """Upstream failures return 500, then 503 once the circuit is open."""
+    settings.OPEN_LIBRARY = {**settings.OPEN_LIBRARY, "MAX_RETRIES": 0, "FAILURE_THRESHOLD": 1}
+    upstream = mocker.patch("requests.Session.get", side_effect=requests.ConnectionError("refused"))
+
+    response = auth_client.get(reverse("book-search-details") + "?query=Dune")
+    assert response.status_code == 500
+
+    response = auth_client.get(reverse("book-search-details") + "?query=Dune")
+    assert response.status_code == 503
+    assert upstream.call_count == 1
@@ -0,0 +1,111 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Book, BookGenre
+from myapp.tests.factories import AuthorFactory, GenreFactory, PublisherFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+@pytest.fixture
+def related():
+    return {
+        "publisher": PublisherFactory(name="Bulk Press"),
+        "authors": AuthorFactory.create_batch(2),
+        "genres": [GenreFactory(name="Fantasy"), GenreFactory(name="Adventure")],
+    }
+
+
+def book_payload(related, index, **overrides):
+    return {
+        "title": f"Bulk Book {index}",
+        "published_date": "2024-01-01",
+        "price": "12.50",
+        "stock_quantity": 3,
+        "publisher": related["publisher"].id,
+        "authors": [author.id for author in related["authors"]],
+        "genres": [related["genres"][index % 2].id],
+        **overrides,
+    }
+
+
+def post(client, payload):
+    return client.post(reverse("book-bulk-create"), payload, format="json")
+
+
+def test_bulk_create(auth_client, related):
+    payload = [book_payload(related, i) for i in range(3)]
+
+    response = post(auth_client, payload)
+
+    assert response.status_code == 201
+    assert response.data["errors"] == []
+    ids = [item["id"] for item in response.data["created"]]
+    assert [item["index"] for item in response.data["created"]] == [0, 1, 2]
+
+    books = Book.objects.filter(pk__in=ids).prefetch_related("authors", "genres").order_by("pk")
+    assert [book.title for book in books] == ["Bulk Book 0", "Bulk Book 1", "Bulk Book 2"]
+    for index, book in enumerate(books):
+        assert set(book.authors.all()) == set(related["authors"])
+        assert list(book.genres.all()) == [related["genres"][index % 2]]
+    # bulk inserts skip signals, search documents are still written
+    assert auth_client.get(reverse("book-list") + "?search=bulk").data["count"] == 3
+
+
+def test_partial_success_reports_item_errors(auth_client, related):
+    payload = [
+        book_payload(related, 0),
+        book_payload(related, 1, title=""),
+        book_payload(related, 2, genres=[999999]),
+        book_payload(related, 3, publisher=999999),
+    ]
+
+    response = post(auth_client, payload)
+
+    assert response.status_code == 207
+    assert [item["index"] for item in response.data["created"]] == [0]
+    errors = {item["index"]: item["errors"] for item in response.data["errors"]}
+    assert set(errors) == {1, 2, 3}
+    assert "title" in errors[1]
+    assert "Genre 999999 does not exist." in errors[2]["genres"]
+    assert "publisher" in errors[3]
+    assert Book.objects.count() == 1
+
+
+def test_all_invalid(auth_client, related):
+    response = post(auth_client, [book_payload(related, 0, price="free")])
+    assert response.status_code == 400
+    assert response.data["created"] == []
+    assert not Book.objects.exists()
+
+
+@pytest.mark.parametrize("payload", [[], {"title": "not a list"}])
+def test_rejects_non_list(auth_client, payload):
+    assert post(auth_client, payload).status_code == 400
+
+
+def test_rejects_oversized_batch(auth_client, related):
+    from myapp.views import BookViewSet
+    payload = [book_payload(related, i) for i in range(BookViewSet.bulk_create_limit + 1)]
+    assert post(auth_client, payload).status_code == 400
+
+
+def test_query_count_does_not_grow_with_batch(auth_client, related):
+    counts = []
+    for size in (5, 50):
+        with CaptureQueriesContext(connection) as queries:
+            response = post(auth_client, [book_payload(related, i) for i in range(size)])
+        assert response.status_code == 201
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
+    assert BookGenre.objects.count() == 55
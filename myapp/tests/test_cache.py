@@ -0,0 +1,219 @@
+import time
+import threading
+import pytest
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.cache import CachedResponseMixin, bump_versions, get_versions
+from myapp.models import Book, Genre
+from myapp.tests.factories import AuthorFactory, BookFactory, GenreFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(params=["locmem", "filebased"], autouse=True)
+def cache_backend(request, settings, tmp_path, monkeypatch):
+    """
+    Run every test against the local-memory and file-based backends. The
+    local-memory one stands in for a shared backend with an atomic add().
+    """
+    backends = {
+        "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"},
+        "filebased": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(tmp_path)},
+    }
+    settings.CACHES = {"default": backends[request.param]}
+    monkeypatch.setattr("myapp.cache.PROCESS_LOCAL_BACKENDS", (DummyCache,))
+    cache.clear()
+    return request.param
+
+
+@pytest.fixture
+def auth_client():
+    """Fixture to authenticate the client using a user factory."""
+    user = UserFactory()
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def test_versions_increase_on_bump():
+    """Bumping a model moves its counter and leaves the others alone."""
+    book_version, genre_version = get_versions([Book, Genre])
+    bump_versions(Book)
+    assert get_versions([Book, Genre]) == [book_version + 1, genre_version]
+
+
+def test_list_is_served_from_cache(auth_client, django_assert_num_queries):
+    """A repeated list request does not touch the database."""
+    for name in ("Drama", "Poetry", "Satire"):
+        GenreFactory(name=name)
+    url = reverse("genre-list")
+
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+
+    # only the JWT user lookup remains
+    with django_assert_num_queries(1):
+        cached = auth_client.get(url)
+    assert cached["X-Cache"] == "HIT"
+    assert cached.data == response.data
+
+
+def test_query_string_is_normalised(auth_client):
+    """Parameter order does not create separate entries."""
+    BookFactory.create_batch(3)
+    base = reverse("book-list")
+
+    assert auth_client.get(base + "?page=1&page_size=2")["X-Cache"] == "MISS"
+    assert auth_client.get(base + "?page_size=2&page=1")["X-Cache"] == "HIT"
+    assert auth_client.get(base + "?page_size=3&page=1")["X-Cache"] == "MISS"
+
+
+def test_saves_invalidate(auth_client):
+    """Saving a model invalidates the responses that depend on it."""
+    genre = GenreFactory(name="Poetry")
+    url = reverse("genre-detail", args=[genre.id])
+    auth_client.get(url)
+
+    genre.name = "Verse"
+    genre.save()
+
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["name"] == "Verse"
+
+
+def test_related_changes_invalidate_books(auth_client):
+    """Author renames and m2m changes invalidate book responses."""
+    book = BookFactory()
+    author = AuthorFactory(first_name="Ann")
+    url = reverse("book-detail", args=[book.id])
+    auth_client.get(url)
+
+    book.authors.add(author)
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["authors"] == [{"id": author.id, "name": f"Ann {author.last_name}"}]
+
+    author.first_name = "Anne"
+    author.save()
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["authors"][0]["name"] == f"Anne {author.last_name}"
+
+    book.delete()
+    assert auth_client.get(url).status_code == 404
+
+
+def test_response_cached_before_commit_is_retired(auth_client, django_capture_on_commit_callbacks):
+    """
+    A request served between a write and its commit (here on the writing
+    connection, standing in for a concurrent one) is not reused afterwards.
+    """
+    url = reverse("genre-list")
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            GenreFactory(name="Drama")
+            assert auth_client.get(url)["X-Cache"] == "MISS"
+            assert auth_client.get(url)["X-Cache"] == "HIT"
+
+    assert auth_client.get(url)["X-Cache"] == "MISS"
+
+
+def test_orders_invalidate_cached_stock(auth_client, django_capture_on_commit_callbacks):
+    """Placing an order shows up in the cached book list."""
+    book = BookFactory(stock_quantity=5)
+    url = reverse("book-list")
+    assert auth_client.get(url).data["results"][0]["stock_quantity"] == 5
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post(reverse("order-list"), {"books": [book.id], "status": "P"})
+    assert response.status_code == 201
+
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["results"][0]["stock_quantity"] == 4
+
+
+def test_scheme_is_part_of_the_key(auth_client):
+    """Cached pages hold absolute links, so http and https are cached apart."""
+    BookFactory.create_batch(3)
+    url = reverse("book-list") + "?page_size=2"
+    assert auth_client.get(url).data["next"].startswith("http://")
+
+    response = auth_client.get(url, secure=True)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["next"].startswith("https://")
+
+
+def test_process_local_cache_is_not_used(auth_client, cache_backend, monkeypatch):
+    """Other workers would never see the bumps, so nothing is cached."""
+    if cache_backend != "locmem":
+        pytest.skip("the file-based backend is shared")
+    monkeypatch.setattr("myapp.cache.PROCESS_LOCAL_BACKENDS", (LocMemCache, DummyCache))
+    GenreFactory(name="Drama")
+    url = reverse("genre-list")
+
+    for _ in range(2):
+        response = auth_client.get(url)
+        assert response.status_code == 200
+        assert "X-Cache" not in response
+
+
+class ProbeView(CachedResponseMixin):
+    """Minimal view exercising the cache without a database."""
+    basename = "probe"
+    action = "list"
+    cache_dependencies = (Genre,)
+
+
+@pytest.fixture
+def probe_request():
+    return Request(APIRequestFactory().get("/probe/?b=2&a=1"))
+
+
+def test_stale_entry_served_while_recomputing(probe_request):
+    """Expired entries are served stale while another request holds the lock."""
+    view = ProbeView()
+    key = view.get_response_cache_key(probe_request)
+    cache.set(key, {"data": {"value": "old"}, "status": 200, "expires": time.time() - 1})
+    cache.add(key + ":lock", 1)
+
+    response = view.cached_response(lambda request: Response({"value": "new"}), probe_request)
+    assert response["X-Cache"] == "STALE"
+    assert response.data == {"value": "old"}
+
+    cache.delete(key + ":lock")
+    response = view.cached_response(lambda request: Response({"value": "new"}), probe_request)
+    assert response["X-Cache"] == "MISS"
+    assert response.data == {"value": "new"}
+
+
+def test_only_one_request_recomputes(probe_request):
+    """Concurrent misses on one key run the handler once."""
+    calls = []
+
+    def slow_handler(request):
+        calls.append(1)
+        time.sleep(0.3)
+        return Response({"value": len(calls)})
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(ProbeView().cached_response(slow_handler, probe_request)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [response.data for response in results] == [{"value": 1}] * 5
@@ -0,0 +1,109 @@
+import gzip
+import io
+import json
+from decimal import Decimal
+import pytest
+from django.core.management import CommandError, call_command
+from myapp.models import Author, Book, BookGenre, Genre, Publisher
+from myapp.tests.factories import AuthorFactory, GenreFactory, PublisherFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    (tmp_path / "publishers.csv").write_text(
+        "name,location,established_year,website,contact_email\n"
+        "Import House,Oslo,1950,,\n"
+        "Import House,Oslo,1950,,\n"
+        "Broken Press,Nowhere,not a year,,\n"
+    )
+    (tmp_path / "authors.ndjson").write_text("\n".join(json.dumps(author) for author in [
+        {"first_name": "Ada", "last_name": "Lovelace", "nationality": "British"},
+        {"first_name": "Alan", "last_name": "Turing"},
+    ]) + "\n")
+    (tmp_path / "genres.csv").write_text('name,description\nScience,"Facts, mostly"\n')
+    with gzip.open(tmp_path / "books.csv.gz", "wt") as f:
+        f.write("title,published_date,price,stock_quantity,description,publisher,authors,genres\n")
+        for i in range(25):
+            f.write(f'Imported {i},2020-01-{i % 28 + 1:02d},9.99,4,"Says ""hi""",Import House,Ada Lovelace; Alan Turing,Science;Existing\n')
+        f.write("No Publisher,2020-01-01,9.99,1,,Unknown Press,,\n")
+        f.write("Bad Date,yesterday,9.99,1,,Import House,,\n")
+    return tmp_path
+
+
+def run(*args):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command("import_catalogue", *args, stdout=stdout, stderr=stderr)
+    return stdout.getvalue(), stderr.getvalue()
+
+
+def test_import_catalogue(catalogue):
+    existing = GenreFactory(name="Existing")
+    stdout, stderr = run(
+        f"--publishers={catalogue / 'publishers.csv'}",
+        f"--authors={catalogue / 'authors.ndjson'}",
+        f"--genres={catalogue / 'genres.csv'}",
+        f"--books={catalogue / 'books.csv.gz'}",
+        "--batch-size=10",
+    )
+
+    assert "Imported 1 publishers." in stdout
+    assert "Imported 2 authors." in stdout
+    assert "Imported 25 books." in stdout
+    assert "rows/s" in stdout
+    assert "3 rows were skipped." in stderr
+    assert "Unknown publisher 'Unknown Press'" in stderr
+    assert "books line 28: published_date" in stderr
+
+    publisher = Publisher.objects.get(name="Import House")
+    assert publisher.established_year == 1950
+    assert Genre.objects.get(name="Science").description == "Facts, mostly"
+
+    books = Book.objects.filter(title__startswith="Imported").prefetch_related("authors", "genres")
+    assert books.count() == 25
+    for book in books:
+        assert book.publisher_id == publisher.pk
+        assert book.price == Decimal("9.99")
+        assert book.description == 'Says "hi"'
+        assert {author.last_name for author in book.authors.all()} == {"Lovelace", "Turing"}
+        assert {genre.name for genre in book.genres.all()} == {"Science", existing.name}
+        assert book.search_document.primary_text.startswith(book.title)
+    assert BookGenre.objects.filter(created_at__isnull=False).count() == 50
+
+
+def test_existing_rows_are_reused(catalogue):
+    publisher = PublisherFactory(name="Import House")
+    author = AuthorFactory(first_name="Ada", last_name="Lovelace")
+    GenreFactory(name="Existing")
+    stdout, _ = run(
+        f"--publishers={catalogue / 'publishers.csv'}",
+        f"--authors={catalogue / 'authors.ndjson'}",
+        f"--genres={catalogue / 'genres.csv'}",
+        f"--books={catalogue / 'books.csv.gz'}",
+        "--skip-index",
+    )
+
+    assert "Imported 0 publishers." in stdout
+    assert "Imported 1 authors." in stdout
+    assert Publisher.objects.filter(name="Import House").count() == 1
+    assert Author.objects.filter(last_name="Lovelace").count() == 1
+    book = Book.objects.filter(title="Imported 0").get()
+    assert book.publisher == publisher
+    assert author in book.authors.all()
+
+
+def test_books_can_be_ndjson(tmp_path):
+    PublisherFactory(name="Import House")
+    path = tmp_path / "books.jsonl"
+    path.write_text(json.dumps({
+        "title": "From JSON", "published_date": "2021-05-01", "price": 5, "stock_quantity": 1,
+        "publisher": "Import House", "authors": [], "genres": [],
+    }) + "\n")
+    run(f"--books={path}", "--format=ndjson")
+    assert Book.objects.get(title="From JSON").price == Decimal("5.00")
+
+
+def test_requires_a_file():
+    with pytest.raises(CommandError):
+        run()
@@ -0,0 +1,103 @@
+import pytest
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.tests.factories import AuthorFactory, BookFactory, OrderFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return UserFactory()
+
+
+@pytest.fixture
+def auth_client(user):
+    """Fixture to authenticate the client as `user`."""
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def test_list_etag_round_trip(auth_client, django_assert_num_queries):
+    """A matching If-None-Match gets an empty 304 without querying books."""
+    BookFactory.create_batch(3)
+    url = reverse("book-list")
+
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert etag.startswith('"')
+
+    # only the JWT user lookup remains
+    with django_assert_num_queries(1):
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response["ETag"] == etag
+
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=f'W/{etag}, "other"')
+    assert response.status_code == 304
+
+
+def test_etag_changes_with_data(auth_client):
+    """Writes to a dependency produce a new ETag."""
+    book = BookFactory()
+    url = reverse("book-detail", args=[book.id])
+    etag = auth_client.get(url)["ETag"]
+
+    book.authors.add(AuthorFactory())
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_etag_depends_on_query_and_user(auth_client, user):
+    """Different filters and different users never share an ETag."""
+    BookFactory.create_batch(2)
+    url = reverse("book-list")
+    etag = auth_client.get(url)["ETag"]
+
+    assert auth_client.get(url + "?page_size=1")["ETag"] != etag
+
+    other = APIClient()
+    other.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    assert other.get(url)["ETag"] != etag
+
+
+def test_last_modified_on_detail(auth_client):
+    """Detail responses carry the object's timestamp and honour If-Modified-Since."""
+    order = OrderFactory()
+    url = reverse("order-detail", args=[order.id])
+
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    assert response["Last-Modified"]
+
+    response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert response.status_code == 304
+
+    response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+    assert response.status_code == 200
+
+
+def test_process_local_cache_disables_validators(auth_client, settings):
+    """Per-process version counters cannot vouch for other workers' writes."""
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    BookFactory()
+    url = reverse("book-list")
+
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    assert "ETag" not in response
+    assert "Last-Modified" not in response
+
+
+def test_missing_object_is_not_conditional(auth_client):
+    """Errors are returned as is, without validators."""
+    response = auth_client.get(reverse("order-detail", args=[999]), HTTP_IF_NONE_MATCH="*")
+    assert response.status_code == 404
+    assert "ETag" not in response
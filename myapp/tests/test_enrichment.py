@@ -0,0 +1,121 @@
+import json
+import threading
+from datetime import date
+from unittest import mock
+import pytest
+import requests
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from myapp.enrichment import enrich_descriptions
+from myapp.models import Book
+from myapp.openlibrary import reset_client
+from myapp.tests.factories import BookFactory, PublisherFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def upstream(mocker, settings):
+    """
+    Fake Open Library answering each title with "About <title>". Titles
+    starting with "unknown" have no match, "broken" ones return 404,
+    "down" ones a connection error, "garbled" ones an unexpected payload,
+    "bare" ones no editions and "typed" ones a typed description value.
+    """
+    settings.OPEN_LIBRARY = {**settings.OPEN_LIBRARY, "MAX_RETRIES": 0, "FAILURE_THRESHOLD": 1, "RATE_LIMIT": 1000}
+    lock = threading.Lock()
+    titles = []
+
+    def get(url, params=None, timeout=None):
+        query = params["q"]
+        with lock:
+            titles.append(query)
+        if query.startswith("down"):
+            raise requests.ConnectionError("refused")
+        if query.startswith("broken"):
+            return mock.Mock(status_code=404, raise_for_status=mock.Mock(side_effect=requests.HTTPError(response=mock.Mock(status_code=404))))
+        docs = [] if query.startswith("unknown") else [{"editions": {"docs": [{"description": f"About {query}"}]}}]
+        if query.startswith("garbled"):
+            docs = [{"editions": ["not", "a", "dict"]}]
+        elif query.startswith("bare"):
+            docs = [{"editions": {"docs": []}}]
+        elif query.startswith("typed"):
+            docs = [{"editions": {"docs": [{"description": {"type": "/type/text", "value": f"About {query}"}}]}}]
+        return mock.Mock(status_code=200, json=lambda: {"docs": docs})
+
+    mocker.patch("requests.Session.get", side_effect=get)
+    return titles
+
+
+@pytest.fixture
+def books():
+    publisher = PublisherFactory(name="Test Publisher")
+    return [
+        BookFactory(title=f"title {i}", description="", publisher=publisher, published_date=date.today())
+        for i in range(7)
+    ]
+
+
+def test_command_fills_missing_descriptions(upstream, books):
+    described = BookFactory(title="described", description="Kept", publisher=books[0].publisher)
+    Book.objects.filter(pk=books[0].pk).update(title="unknown")
+    Book.objects.filter(pk=books[1].pk).update(title="broken")
+
+    call_command("enrich_descriptions", "--concurrency=3", "--batch-size=2", stdout=mock.Mock())
+
+    assert sorted(upstream) == sorted(["unknown", "broken"] + [f"title {i}" for i in range(2, 7)])
+    for book in books[2:]:
+        book.refresh_from_db()
+        assert book.description == f"About {book.title}"
+    described.refresh_from_db()
+    assert described.description == "Kept"
+    # the search index sees the new text
+    assert Book.objects.get(pk=books[2].pk).search_document.secondary_text.startswith("About title 2")
+
+
+def test_malformed_responses_fail_only_their_book(upstream, books):
+    """An unexpected payload counts its book as failed and the batch is still saved."""
+    Book.objects.filter(pk=books[0].pk).update(title="garbled")
+    Book.objects.filter(pk=books[1].pk).update(title="bare")
+    Book.objects.filter(pk=books[2].pk).update(title="typed")
+
+    progress = enrich_descriptions(Book.objects.all(), concurrency=3, batch_size=10)
+
+    assert progress.failed == 1
+    assert progress.updated == 5
+    assert Book.objects.get(pk=books[1].pk).description == ""
+    assert Book.objects.get(pk=books[2].pk).description == "About typed"
+
+
+def test_command_resumes_from_checkpoint(upstream, books, tmp_path):
+    checkpoint = tmp_path / "enrich.json"
+    Book.objects.filter(pk=books[4].pk).update(title="down")
+    options = ["--batch-size=1", "--concurrency=1", f"--checkpoint={checkpoint}"]
+
+    # the failure opens the circuit and the next batch stops the run
+    with pytest.raises(CommandError):
+        call_command("enrich_descriptions", *options, stdout=mock.Mock())
+    assert json.loads(checkpoint.read_text())["last_pk"] == books[4].pk
+    assert Book.objects.filter(description="").count() == 3
+
+    Book.objects.filter(pk=books[4].pk).update(title="title 4")
+    upstream.clear()
+    reset_client(setting="OPEN_LIBRARY")
+    call_command("enrich_descriptions", *options, stdout=mock.Mock())
+    assert upstream == ["title 5", "title 6"]
+    assert json.loads(checkpoint.read_text())["last_pk"] == books[6].pk
+
+    # failed books are picked up again by a run without the checkpoint
+    call_command("enrich_descriptions", stdout=mock.Mock())
+    assert not Book.objects.filter(description="").exists()
+
+
+def test_admin_action(upstream, books, admin_client):
+    response = admin_client.post(reverse("admin:myapp_book_changelist"), {
+        "action": "enrich_descriptions",
+        "_selected_action": [book.pk for book in books[:3]],
+    }, follow=True)
+
+    assert response.status_code == 200
+    assert "Updated 3 of 3 books" in response.content.decode()
+    assert Book.objects.filter(description__startswith="About").count() == 3
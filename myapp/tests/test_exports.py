@@ -0,0 +1,118 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Order, OrderItem, Review
+from myapp.tests.factories import (
+    AuthorFactory, BookFactory, OrderFactory, PublisherFactory, UserFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@pytest.fixture
+def staff_client():
+    return client_for(UserFactory(is_staff=True))
+
+
+@pytest.fixture
+def books():
+    publisher = PublisherFactory(name="Export Press")
+    author = AuthorFactory(first_name="Ada", last_name="Lovelace")
+    books = [
+        BookFactory(title=f"Export {i}", publisher=publisher, price=10, published_date=date.today(), description='Line one\nsaid "hi"')
+        for i in range(3)
+    ]
+    for book in books:
+        book.authors.add(author)
+    return books
+
+
+def content(response):
+    return b"".join(response.streaming_content)
+
+
+def test_books_csv(staff_client, books):
+    response = staff_client.get(reverse("book-export"))
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    assert response["Content-Disposition"].startswith('attachment; filename="books-')
+    rows = list(csv.DictReader(io.StringIO(content(response).decode())))
+    assert [row["title"] for row in rows] == ["Export 0", "Export 1", "Export 2"]
+    assert rows[0]["authors"] == "Ada Lovelace"
+    assert rows[0]["publisher"] == "Export Press"
+    assert rows[0]["description"] == 'Line one\nsaid "hi"'
+
+
+def test_export_applies_filters(staff_client, books):
+    books[1].price = 99
+    books[1].save()
+    response = staff_client.get(reverse("book-export") + "?output=ndjson&price_min=50")
+    rows = [json.loads(line) for line in content(response).decode().splitlines()]
+    assert [row["title"] for row in rows] == ["Export 1"]
+
+
+def test_orders_ndjson_gzip(staff_client, books):
+    order = OrderFactory()
+    OrderItem.objects.create(order=order, book=books[0], quantity=2)
+    OrderItem.objects.create(order=order, book=books[1], quantity=1)
+    empty = OrderFactory()
+
+    response = staff_client.get(reverse("order-export") + "?output=ndjson&gzip=1")
+
+    assert response["Content-Type"] == "application/gzip"
+    assert response["Content-Disposition"].endswith('.ndjson.gz"')
+    rows = [json.loads(line) for line in gzip.decompress(content(response)).decode().splitlines()]
+    assert [(row["order_id"], row.get("book_id"), row.get("quantity")) for row in rows] == [
+        (order.pk, books[0].pk, 2), (order.pk, books[1].pk, 1), (empty.pk, None, None),
+    ]
+
+
+def test_reviews_csv(staff_client, books):
+    for rating in (3, 5):
+        Review.objects.create(book=books[0], user=UserFactory(), review_text="Fine", rating=rating)
+    rows = list(csv.DictReader(io.StringIO(content(staff_client.get(reverse("review-export"))).decode())))
+    assert len(rows) == 2
+    assert rows[0]["book_title"] == "Export 0"
+
+
+def test_export_is_staff_only(books):
+    assert client_for(UserFactory()).get(reverse("book-export")).status_code == 403
+
+
+def test_unknown_output(staff_client):
+    assert staff_client.get(reverse("book-export") + "?output=xml").status_code == 400
+
+
+def test_rows_are_streamed_in_chunks(staff_client, books, monkeypatch):
+    monkeypatch.setattr("myapp.exports.LINES_PER_WRITE", 1)
+    response = staff_client.get(reverse("book-export"))
+    assert len(list(response.streaming_content)) == 4  # header and one chunk per row
+
+
+def test_admin_action(admin_client, books):
+    response = admin_client.post(reverse("admin:myapp_book_changelist"), {
+        "action": "export_ndjson_gz",
+        "_selected_action": [books[0].pk, books[2].pk],
+    })
+    rows = [json.loads(line) for line in gzip.decompress(content(response)).decode().splitlines()]
+    assert [row["id"] for row in rows] == [books[0].pk, books[2].pk]
+
+    OrderFactory()
+    response = admin_client.post(reverse("admin:myapp_order_changelist"), {
+        "action": "export_csv",
+        "_selected_action": list(Order.objects.values_list("pk", flat=True)),
+    })
+    assert content(response).decode().startswith("order_id,user,status")
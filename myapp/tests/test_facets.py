@@ -0,0 +1,94 @@
+from datetime import date
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.facets import facet_counts
+from myapp.models import Book, BookGenre
+from myapp.tests.factories import BookFactory, GenreFactory, PublisherFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+@pytest.fixture
+def catalogue():
+    north, south = PublisherFactory(name="North Press"), PublisherFactory(name="South Press")
+    poetry, drama = GenreFactory(name="Poetry"), GenreFactory(name="Drama")
+    books = [
+        BookFactory(title="Cheap verse", price=10, published_date=date(2020, 5, 1), publisher=north, description=""),
+        BookFactory(title="Fair verse", price=30, published_date=date(2020, 6, 1), publisher=north, description=""),
+        BookFactory(title="Dear play", price=80, published_date=date(2021, 1, 1), publisher=south, description=""),
+    ]
+    BookGenre.objects.create(books=books[0], genre=poetry)
+    BookGenre.objects.create(books=books[1], genre=poetry)
+    BookGenre.objects.create(books=books[1], genre=drama)
+    BookGenre.objects.create(books=books[2], genre=drama)
+    return {"north": north, "south": south, "poetry": poetry, "drama": drama, "books": books}
+
+
+def counts(facet, key="id"):
+    return {value[key]: value["count"] for value in facet}
+
+
+def test_facets_of_the_whole_catalogue(auth_client, catalogue):
+    response = auth_client.get(reverse("book-facets"))
+
+    assert response.status_code == 200
+    data = response.data
+    assert data["count"] == 3
+    assert counts(data["genres"]) == {catalogue["poetry"].pk: 2, catalogue["drama"].pk: 2}
+    assert counts(data["publishers"]) == {catalogue["north"].pk: 2, catalogue["south"].pk: 1}
+    assert counts(data["price_bands"], "value") == {"cheap": 1, "moderate": 1, "expensive": 1}
+    assert counts(data["years"], "year") == {2020: 2, 2021: 1}
+
+
+def test_facets_follow_filters_and_search(auth_client, catalogue):
+    data = auth_client.get(reverse("book-facets") + "?price_min=20&search=verse").data
+
+    assert data["count"] == 1
+    assert counts(data["genres"]) == {catalogue["poetry"].pk: 1, catalogue["drama"].pk: 1}
+    assert counts(data["publishers"]) == {catalogue["north"].pk: 1}
+    assert counts(data["price_bands"], "value") == {"cheap": 0, "moderate": 1, "expensive": 0}
+    assert counts(data["years"], "year") == {2020: 1}
+
+
+def test_invalid_filters_are_rejected(auth_client, catalogue):
+    assert auth_client.get(reverse("book-facets") + "?price_min=cheap").status_code == 400
+
+
+def test_query_count_does_not_grow_with_facet_values(catalogue, django_assert_num_queries):
+    with django_assert_num_queries(4):
+        facet_counts(Book.objects.all())
+    for n in range(5):
+        book = BookFactory(publisher=PublisherFactory(name=f"Press {n}"), published_date=date(2000 + n, 1, 1))
+        BookGenre.objects.create(books=book, genre=GenreFactory(name=f"Genre {n}"))
+    with django_assert_num_queries(4):
+        assert facet_counts(Book.objects.all())["count"] == 8
+
+
+def test_cached_per_filter_signature(auth_client, catalogue, django_assert_num_queries):
+    url = reverse("book-facets")
+    assert auth_client.get(url + "?price_min=20&published_date_range=this_year")["X-Cache"] == "MISS"
+    # Same filters: reordered, paginated, reordered results, 20.00 for 20;
+    # only the JWT user lookup remains
+    with django_assert_num_queries(1):
+        response = auth_client.get(url + "?published_date_range=this_year&page=2&ordering=-rating&price_min=20.00")
+    assert response["X-Cache"] == "HIT"
+    assert auth_client.get(url + "?price_min=21&published_date_range=this_year")["X-Cache"] == "MISS"
+
+
+def test_catalogue_changes_invalidate(auth_client, catalogue):
+    url = reverse("book-facets")
+    assert auth_client.get(url).data["count"] == 3
+    BookFactory(publisher=catalogue["south"])
+
+    response = auth_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["count"] == 4
@@ -1,6 +1,7 @@
 import pytest
-from datetime import timedelta
+from datetime import date, timedelta
 from django.utils import timezone
+from myapp.filters import BookFilter, filter_published, published_in
 from myapp.models import Book
 from myapp.tests.factories import BookFactory
 
@@ -19,3 +20,22 @@ def test_book_filters():
     cheap_books = Book.objects.filter(price__lte=10)
     assert cheap_book in cheap_books
     assert expensive_book not in cheap_books
+
+
+@pytest.mark.django_db
+def test_published_in_covers_the_whole_year():
+    inside = [BookFactory(published_date=day, cover_photo="") for day in (date(2023, 1, 1), date(2023, 12, 31))]
+    for day in (date(2022, 12, 31), date(2024, 1, 1)):
+        BookFactory(published_date=day, cover_photo="")
+
+    assert sorted(Book.objects.filter(published_in(2023)).values_list("pk", flat=True)) == [book.pk for book in inside]
+
+
+@pytest.mark.django_db
+def test_date_filters_are_ranges_on_the_column():
+    """No per-row date extraction, so an index on published_date serves them."""
+    for value in ("last_7_days", "this_year", "today"):
+        sql = str(filter_published(Book.objects.all(), value).query).lower()
+        assert "extract" not in sql and "strftime" not in sql
+        sql = str(BookFilter({"published_date_range": value}, queryset=Book.objects.all()).qs.query).lower()
+        assert "extract" not in sql and "strftime" not in sql
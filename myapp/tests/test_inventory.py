@@ -0,0 +1,243 @@
+import io
+import threading
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.inventory import InsufficientStock, decrement_stock, set_stock_shards, with_stock
+from myapp.models import Book, Order, OrderItem, StockShard
+from myapp.tests.factories import BookFactory, UserFactory
+
+
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+def coverless_book(**kwargs):
+    # Without a cover, committing starts no background rendition that would
+    # race with the database flush after transactional tests.
+    return BookFactory(cover_photo="", **kwargs)
+
+
+@pytest.mark.django_db
+def test_decrement_stock_in_one_update(django_assert_num_queries):
+    first, second = BookFactory(stock_quantity=5), BookFactory(stock_quantity=2)
+
+    # savepoint, lock, update, release
+    with transaction.atomic(), django_assert_num_queries(4):
+        decrement_stock({second.pk: 2, first.pk: 3})
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.stock_quantity, second.stock_quantity) == (2, 0)
+
+
+@pytest.mark.django_db
+def test_decrement_stock_is_all_or_nothing():
+    first, second = BookFactory(stock_quantity=5), BookFactory(stock_quantity=1)
+
+    with transaction.atomic(), pytest.raises(InsufficientStock) as error:
+        decrement_stock({first.pk: 1, second.pk: 2})
+
+    assert {book.pk: available for book, available in error.value.shortages.items()} == {second.pk: 1}
+    assert list(Book.objects.order_by("pk").values_list("stock_quantity", flat=True)) == [5, 1]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_decrement_stock_needs_a_transaction():
+    with pytest.raises(RuntimeError):
+        decrement_stock({coverless_book().pk: 1})
+
+
+@pytest.mark.django_db
+def test_order_counts_repeated_books():
+    book = BookFactory(stock_quantity=3, price=Decimal("4.00"))
+
+    response = auth_client().post(reverse("order-list"), {"books": [book.id, book.id], "status": "P"})
+
+    assert response.status_code == 201
+    assert Decimal(response.data["total_price"]) == Decimal("8.00")
+    assert OrderItem.objects.get(order_id=response.data["id"]).quantity == 2
+    book.refresh_from_db()
+    assert book.stock_quantity == 1
+
+
+@pytest.mark.django_db
+def test_order_rejected_when_out_of_stock():
+    available, sold_out = BookFactory(stock_quantity=3), BookFactory(stock_quantity=0, title="Sold Out")
+
+    response = auth_client().post(reverse("order-list"), {"books": [available.id, sold_out.id], "status": "P"})
+
+    assert response.status_code == 400
+    assert response.data == ["Insufficient stock for 'Sold Out'. Only 0 available."]
+    assert not Order.objects.exists()
+    available.refresh_from_db()
+    assert available.stock_quantity == 3
+
+
+def shards(book):
+    return list(StockShard.objects.filter(book=book).order_by("shard").values_list("quantity", flat=True))
+
+
+def stock(book):
+    return with_stock(Book.objects.filter(pk=book.pk)).get().available_stock
+
+
+@pytest.mark.django_db
+def test_set_stock_shards():
+    book = BookFactory(stock_quantity=10)
+
+    assert set_stock_shards(book.pk, 4) == 10
+    assert shards(book) == [3, 3, 2, 2]
+    book.refresh_from_db()
+    assert (book.stock_quantity, book.stock_shard_count) == (10, 4)
+
+    set_stock_shards(book.pk, 2, stock=7)
+    assert shards(book) == [4, 3]
+
+    set_stock_shards(book.pk, 0)
+    assert shards(book) == []
+    book.refresh_from_db()
+    assert (book.stock_quantity, book.stock_shard_count) == (7, 0)
+
+
+@pytest.mark.django_db
+def test_sharded_stock_leaves_the_book_row_alone():
+    hot, plain = BookFactory(stock_quantity=8), BookFactory(stock_quantity=5)
+    set_stock_shards(hot.pk, 4)
+
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        decrement_stock({hot.pk: 2, plain.pk: 1})
+
+    book_updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "myapp_book"')]
+    assert len(book_updates) == 1 and str(plain.pk) in book_updates[0]
+    assert sorted(shards(hot)) == [0, 2, 2, 2]
+    assert (stock(hot), stock(plain)) == (6, 4)
+    hot.refresh_from_db()
+    assert hot.stock_quantity == 8  # until the next rebalance
+
+
+@pytest.mark.django_db
+def test_sharded_stock_falls_back_to_all_shards():
+    book = BookFactory(stock_quantity=8, title="Hot")
+    set_stock_shards(book.pk, 4)
+
+    with transaction.atomic():
+        decrement_stock({book.pk: 7})
+    assert stock(book) == 1
+
+    with transaction.atomic(), pytest.raises(InsufficientStock) as error:
+        decrement_stock({book.pk: 2})
+    assert [(book.title, available) for book, available in error.value.shortages.items()] == [("Hot", 1)]
+    assert stock(book) == 1
+
+
+@pytest.mark.django_db
+def test_rebalance_stock_command():
+    book, plain = BookFactory(stock_quantity=9), BookFactory(stock_quantity=3)
+    set_stock_shards(book.pk, 3)
+    with transaction.atomic():
+        decrement_stock({book.pk: 3})
+
+    stdout = io.StringIO()
+    call_command("rebalance_stock", stdout=stdout)
+
+    assert "Rebalanced 1 books." in stdout.getvalue()
+    assert shards(book) == [2, 2, 2]
+    book.refresh_from_db()
+    assert book.stock_quantity == 6
+    plain.refresh_from_db()
+    assert plain.stock_quantity == 3
+
+
+@pytest.mark.django_db
+def test_shard_stock_command():
+    book = BookFactory(stock_quantity=5)
+    call_command("shard_stock", book.pk, "--shards=2", stdout=io.StringIO())
+    assert shards(book) == [3, 2]
+    call_command("shard_stock", book.pk, "--shards=0", stdout=io.StringIO())
+    assert shards(book) == []
+
+
+@pytest.mark.django_db
+def test_api_reads_and_writes_sharded_stock():
+    book = BookFactory(stock_quantity=8)
+    set_stock_shards(book.pk, 2)
+    client = auth_client()
+
+    response = client.post(reverse("order-list"), {"books": [book.id] * 3, "status": "P"})
+    assert response.status_code == 201
+    assert client.get(reverse("book-detail", args=[book.id])).data["stock_quantity"] == 5
+
+    response = client.patch(reverse("book-detail", args=[book.id]), {"stock_quantity": 20})
+    assert response.status_code == 200
+    assert shards(book) == [10, 10]
+    book.refresh_from_db()
+    assert (book.stock_quantity, book.stock_shard_count) == (20, 2)
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="needs row locks and concurrent connections")
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_orders_never_oversell():
+    """
+    Many buyers race for the last copies, half of them ordering the two
+    books in the opposite order. Exactly the stock is sold and nobody
+    deadlocks.
+    """
+    first, second = coverless_book(stock_quantity=6), coverless_book(stock_quantity=6)
+    clients = [auth_client() for _ in range(20)]
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def buy(client, books):
+        try:
+            barrier.wait()
+            response = client.post(reverse("order-list"), {"books": books, "status": "P"})
+            statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=buy, args=(client, [first.id, second.id] if i % 2 else [second.id, first.id]))
+        for i, client in enumerate(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 6 + [400] * 14
+    assert list(Book.objects.filter(pk__in=[first.pk, second.pk]).values_list("stock_quantity", flat=True)) == [0, 0]
+    assert sum(OrderItem.objects.values_list("quantity", flat=True)) == 12
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="needs row locks and concurrent connections")
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_orders_never_oversell_sharded_stock():
+    book = coverless_book(stock_quantity=9)
+    set_stock_shards(book.pk, 4)
+    clients = [auth_client() for _ in range(20)]
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def buy(client):
+        try:
+            barrier.wait()
+            statuses.append(client.post(reverse("order-list"), {"books": [book.id], "status": "P"}).status_code)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buy, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 9 + [400] * 11
+    assert shards(book) == [0, 0, 0, 0]
@@ -0,0 +1,101 @@
+import io
+from datetime import timedelta
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.leaderboards import refresh_leaderboards
+from myapp.models import BookGenre, BookRanking, Order, OrderItem, Review
+from myapp.tests.factories import BookFactory, GenreFactory, OrderFactory, PublisherFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+def sell(book, quantity, days_ago=0):
+    order = OrderFactory()
+    if days_ago:
+        Order.objects.filter(pk=order.pk).update(ordered_date=timezone.now() - timedelta(days=days_ago))
+    OrderItem.objects.create(order=order, book=book, quantity=quantity)
+
+
+@pytest.fixture
+def catalogue():
+    publisher = PublisherFactory(name="Leader Press")
+    poetry, drama = GenreFactory(name="Poetry"), GenreFactory(name="Drama")
+    first = BookFactory(title="First", publisher=publisher)
+    second = BookFactory(title="Second", publisher=publisher)
+    third = BookFactory(title="Third", publisher=PublisherFactory(name="Other Press"))
+    BookGenre.objects.create(books=first, genre=poetry)
+    BookGenre.objects.create(books=second, genre=poetry)
+    BookGenre.objects.create(books=second, genre=drama)
+    sell(first, 3)
+    sell(second, 1)
+    sell(second, 5, days_ago=10)
+    Review.objects.create(book=first, user=UserFactory(), review_text="Great", rating=5)
+    Review.objects.create(book=second, user=UserFactory(), review_text="Fine", rating=3)
+    refresh_leaderboards()
+    return {"publisher": publisher, "poetry": poetry, "drama": drama, "books": (first, second, third)}
+
+
+def titles(response):
+    assert response.status_code == 200
+    return [(row["title"], row.get("units", row.get("ratings"))) for row in response.data]
+
+
+def test_bestsellers(auth_client, catalogue):
+    url = reverse("book-bestsellers")
+    assert titles(auth_client.get(url)) == [("First", 3), ("Second", 1)]
+    assert titles(auth_client.get(url + "?days=30")) == [("Second", 6), ("First", 3)]
+    assert titles(auth_client.get(url + f"?publisher={catalogue['publisher'].pk}&limit=1")) == [("First", 3)]
+    assert auth_client.get(url + "?days=3").status_code == 400
+
+
+def test_top_rated(auth_client, catalogue):
+    url = reverse("book-top-rated")
+    response = auth_client.get(url)
+    assert titles(response) == [("First", 1), ("Second", 1)]
+    assert [row["rank"] for row in response.data] == [1, 2]
+    assert titles(auth_client.get(url + f"?genre={catalogue['drama'].pk}")) == [("Second", 1)]
+    assert auth_client.get(url + "?genre=1&publisher=1").status_code == 400
+    assert auth_client.get(url + "?limit=many").status_code == 400
+
+
+def test_reads_are_one_query(auth_client, catalogue, django_assert_num_queries):
+    with django_assert_num_queries(2):  # user, rankings
+        auth_client.get(reverse("book-bestsellers") + "?days=30&limit=50")
+
+
+def test_refresh_only_reranks_new_activity(catalogue):
+    first, second, third = catalogue["books"]
+    sell(third, 10)
+
+    assert refresh_leaderboards() == 1
+    assert refresh_leaderboards() == 0
+    assert BookRanking.objects.get(scope="all", book=third).units_7d == 10
+
+
+def test_sales_leave_the_windows(catalogue):
+    refresh_leaderboards(now=timezone.now() + timedelta(days=8))
+
+    assert not BookRanking.objects.filter(units_7d__gt=0).exists()
+    assert BookRanking.objects.get(scope="all", book=catalogue["books"][1]).units_30d == 6
+    # Rated books keep their ranking without sales
+    assert BookRanking.objects.filter(scope="all").count() == 2
+
+
+def test_full_refresh_command(catalogue):
+    BookRanking.objects.all().delete()
+    stdout = io.StringIO()
+    call_command("refresh_leaderboards", "--full", stdout=stdout)
+    assert "Ranked 3 books." in stdout.getvalue()
+    # overall, publisher and genres
+    assert BookRanking.objects.filter(book=catalogue["books"][1]).count() == 4
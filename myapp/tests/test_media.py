@@ -0,0 +1,100 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.utils.http import http_date
+from myapp.storage import cover_storage
+
+pytestmark = pytest.mark.django_db
+
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def hashed_cover():
+    return cover_storage().save("covers/cover.jpg", ContentFile(CONTENT))
+
+
+@pytest.fixture
+def plain_file(media_root):
+    (media_root / "notes").mkdir(parents=True)
+    (media_root / "notes" / "readme.txt").write_bytes(b"hello world")
+    return "notes/readme.txt"
+
+
+def body(response):
+    return b"".join(response.streaming_content)
+
+
+def test_serves_hashed_file_as_immutable(client, hashed_cover):
+    response = client.get(f"/media/{hashed_cover}")
+
+    assert response.status_code == 200
+    assert body(response) == CONTENT
+    assert response["Content-Type"] == "image/jpeg"
+    assert response["Content-Length"] == str(len(CONTENT))
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response["ETag"] == '"%s"' % hashed_cover.rsplit("/", 1)[1].split(".")[0]
+    assert response["Accept-Ranges"] == "bytes"
+
+
+def test_other_files_get_a_short_max_age(client, plain_file, settings):
+    settings.MEDIA_MAX_AGE = 60
+    response = client.get(f"/media/{plain_file}")
+    assert body(response) == b"hello world"
+    assert response["Cache-Control"] == "public, max-age=60"
+
+
+def test_if_none_match(client, hashed_cover):
+    etag = client.get(f"/media/{hashed_cover}")["ETag"]
+    response = client.get(f"/media/{hashed_cover}", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    response = client.get(f"/media/{hashed_cover}", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, len(CONTENT) - 1),
+    ("bytes=-10", len(CONTENT) - 10, len(CONTENT) - 1),
+    ("bytes=10200-99999", 10200, len(CONTENT) - 1),
+])
+def test_range_requests(client, hashed_cover, header, start, end):
+    response = client.get(f"/media/{hashed_cover}", HTTP_RANGE=header)
+
+    assert response.status_code == 206
+    assert body(response) == CONTENT[start:end + 1]
+    assert response["Content-Length"] == str(end - start + 1)
+    assert response["Content-Range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+
+
+def test_unsatisfiable_range(client, hashed_cover):
+    response = client.get(f"/media/{hashed_cover}", HTTP_RANGE=f"bytes={len(CONTENT)}-")
+    assert response.status_code == 416
+    assert response["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range_mismatch_sends_the_whole_file(client, hashed_cover):
+    response = client.get(f"/media/{hashed_cover}", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+    assert response.status_code == 200
+    assert body(response) == CONTENT
+
+    response = client.get(f"/media/{hashed_cover}", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=http_date(0))
+    assert response.status_code == 200
+
+
+def test_accel_redirect(client, hashed_cover, settings):
+    settings.MEDIA_ACCEL_REDIRECT = "/protected-media/"
+    response = client.get(f"/media/{hashed_cover}")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response["X-Accel-Redirect"] == f"/protected-media/{hashed_cover}"
+
+
+@pytest.mark.parametrize("path", ["missing.jpg", "covers", "../settings.py", "%2e%2e/%2e%2e/etc/passwd"])
+def test_not_found(client, hashed_cover, path):
+    assert client.get(f"/media/{path}").status_code == 404
+
+
+def test_only_safe_methods(client, hashed_cover):
+    assert client.post(f"/media/{hashed_cover}").status_code == 405
@@ -0,0 +1,220 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from myapp.diskcache import PersistentCache
+from myapp.openlibrary import (
+    CircuitBreaker, OpenLibraryClient, OpenLibraryError, OpenLibraryUnavailable, RateLimiter,
+    extract_description,
+)
+from myapp.tests.test_mocks import mock_open_library_response_data
+
+
+class StubOpenLibrary(BaseHTTPRequestHandler):
+    """
+    Local stand-in for openlibrary.org. The behaviour is chosen by the `q`
+    parameter: "slow" sleeps past the read timeout, "down" returns 503,
+    "flaky" fails twice before answering, "missing" returns 404.
+    """
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        with server.lock:
+            server.hits[query] = server.hits.get(query, 0) + 1
+            hits = server.hits[query]
+
+        if query == "slow":
+            time.sleep(0.5)
+        if query == "down" or (query == "flaky" and hits <= 2):
+            return self.reply(503, {"error": "unavailable"})
+        if query == "missing":
+            return self.reply(404, {"error": "not found"})
+        self.reply(200, mock_open_library_response_data)
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenLibrary)
+    server.hits = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(stub_server, tmp_path):
+    def make(**options):
+        defaults = {
+            "BASE_URL": f"http://127.0.0.1:{stub_server.server_address[1]}",
+            "CACHE_PATH": str(tmp_path / "openlibrary.sqlite3"),
+            "READ_TIMEOUT": 0.2,
+            "BACKOFF": 0,
+            "RATE_LIMIT": 1000,
+            "BURST": 1000,
+        }
+        return OpenLibraryClient(**{**defaults, **options})
+    return make
+
+
+def test_search(make_client, stub_server):
+    """A healthy upstream answers through the pooled session."""
+    client = make_client()
+    data = client.search("Crime and Punishment")
+    assert data["docs"][0]["title"] == "Crime and Punishment"
+    assert extract_description(data).startswith("<p><i>Crime and Punishment</i>")
+
+
+def test_read_timeout(make_client, stub_server):
+    """A slow upstream fails after the read timeout instead of hanging."""
+    client = make_client(MAX_RETRIES=1)
+    started = time.monotonic()
+    with pytest.raises(OpenLibraryError):
+        client.search("slow")
+    assert time.monotonic() - started < 1
+    assert stub_server.hits["slow"] == 2
+
+
+def test_retries_transient_errors(make_client, stub_server):
+    """5xx responses are retried up to the limit."""
+    client = make_client(MAX_RETRIES=2)
+    assert client.search("flaky")["docs"]
+    assert stub_server.hits["flaky"] == 3
+
+
+def test_client_errors_are_not_retried(make_client, stub_server):
+    """A 4xx is reported at once and does not count against the circuit."""
+    client = make_client(MAX_RETRIES=2, FAILURE_THRESHOLD=1)
+    with pytest.raises(OpenLibraryError):
+        client.search("missing")
+    assert stub_server.hits["missing"] == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_fails_fast(make_client, stub_server):
+    """After repeated failures calls are rejected without reaching upstream."""
+    client = make_client(MAX_RETRIES=0, FAILURE_THRESHOLD=2, RESET_TIMEOUT=0.2)
+    for _ in range(2):
+        with pytest.raises(OpenLibraryError):
+            client.search("down")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(OpenLibraryUnavailable):
+        client.search("Crime and Punishment")
+    assert "Crime and Punishment" not in stub_server.hits
+
+    # after the reset timeout a single trial call closes the circuit again
+    time.sleep(0.25)
+    assert client.search("Crime and Punishment")["docs"]
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_trial_call_does_not_wedge_the_circuit(make_client, stub_server):
+    """A half-open trial turned away by the rate limiter leaves the circuit open."""
+    client = make_client(MAX_RETRIES=0, FAILURE_THRESHOLD=1, RESET_TIMEOUT=0)
+    with pytest.raises(OpenLibraryError):
+        client.search("down")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    client.rate_limiter = RateLimiter(rate=1, burst=0, max_wait=0)
+    with pytest.raises(OpenLibraryUnavailable, match="rate limit"):
+        client.search("Crime and Punishment")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    client.rate_limiter = RateLimiter(rate=1000, burst=1000, max_wait=1)
+    assert client.search("Crime and Punishment")["docs"]
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limiter_spaces_requests():
+    """Requests beyond the burst wait for the bucket to refill."""
+    limiter = RateLimiter(rate=20, burst=2, max_wait=1)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_rate_limiter_rejects_long_waits():
+    """A caller that would wait longer than max_wait is turned away."""
+    limiter = RateLimiter(rate=1, burst=1, max_wait=0.5)
+    limiter.acquire()
+    with pytest.raises(OpenLibraryUnavailable):
+        limiter.acquire()
+
+
+def test_responses_are_cached_on_disk(make_client, stub_server):
+    """Repeated searches, also from a fresh client, are served from the cache."""
+    assert make_client().search("Crime and Punishment")["docs"]
+
+    client = make_client()
+    started = time.monotonic()
+    data = client.search("  crime AND   punishment ")
+    assert time.monotonic() - started < 0.01
+    assert data["docs"][0]["title"] == "Crime and Punishment"
+    assert stub_server.hits == {"crime and punishment": 1}
+
+
+def test_concurrent_searches_share_one_fetch(make_client, stub_server):
+    """Identical requests in flight at the same time reach upstream once."""
+    client = make_client(READ_TIMEOUT=2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: client.search("slow"), range(8)))
+    assert all(result["docs"] for result in results)
+    assert stub_server.hits["slow"] == 1
+
+
+def test_errors_are_not_cached(make_client, stub_server):
+    """A failed lookup is retried on the next call."""
+    client = make_client(MAX_RETRIES=0)
+    for _ in range(2):
+        with pytest.raises(OpenLibraryError):
+            client.search("missing")
+    assert stub_server.hits["missing"] == 2
+
+
+def test_cache_client_can_be_disabled(make_client, stub_server):
+    client = make_client(CACHE_PATH=None)
+    client.search("Crime and Punishment")
+    client.search("Crime and Punishment")
+    assert stub_server.hits["crime and punishment"] == 2
+
+
+def test_persistent_cache_expiry(tmp_path):
+    """Entries are gone once their TTL has passed."""
+    cache = PersistentCache(tmp_path / "cache.sqlite3", ttl=0.1, max_entries=10)
+    cache.set("key", {"value": 1})
+    assert cache.get("key") == {"value": 1}
+    time.sleep(0.15)
+    assert cache.get("key") is None
+
+
+def test_persistent_cache_evicts_least_recently_used(tmp_path):
+    """Past max_entries the entries read longest ago are dropped first."""
+    cache = PersistentCache(tmp_path / "cache.sqlite3", ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
@@ -2,7 +2,7 @@ import pytest
 from decimal import Decimal
 from rest_framework import status
 from rest_framework.test import APIClient
-from myapp.models import Order, Book
+from myapp.models import Order, OrderItem, Book
 from rest_framework_simplejwt.tokens import RefreshToken
 from myapp.tests.factories import OrderFactory, UserFactory, BookFactory
 from django.urls import reverse
@@ -77,3 +77,51 @@ class TestOrderAPI:
         response = auth_client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert not Order.objects.filter(id=order.id).exists()
+
+
+@pytest.fixture
+def history(user):
+    """Six orders of `user`, one item each, and an order of someone else."""
+    orders = []
+    for status_code in "PPCCFR":
+        order = OrderFactory(user=user, status=status_code)
+        OrderItem.objects.create(order=order, book=BookFactory(), quantity=2)
+        orders.append(order)
+    OrderFactory()
+    return orders
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@pytest.mark.django_db
+class TestOrderHistory:
+
+    def test_only_the_users_orders_newest_first(self, user, history):
+        response = client_for(user).get(reverse("order-history") + "?page_size=10")
+        assert response.status_code == status.HTTP_200_OK
+        assert [order["id"] for order in response.data["results"]] == [order.id for order in reversed(history)]
+        item = response.data["results"][0]["items"][0]
+        assert item["book"] == history[-1].items.get().book_id
+        assert item["quantity"] == 2
+
+    def test_query_count_is_constant(self, user, history, django_assert_max_num_queries):
+        client = client_for(user)
+        with django_assert_max_num_queries(4):  # user + count, page, items
+            client.get(reverse("order-history") + "?page_size=2")
+        with django_assert_max_num_queries(4):
+            client.get(reverse("order-history") + "?page_size=6")
+
+    def test_status_filter(self, user, history):
+        client = client_for(user)
+        response = client.get(reverse("order-history") + "?status=C,F")
+        assert [order["status"] for order in response.data["results"]] == ["F", "C", "C"]
+        response = client.get(reverse("order-history") + "?status=P&status=R&pagination=cursor")
+        assert [order["status"] for order in response.data["results"]] == ["R", "P", "P"]
+
+    def test_unknown_status(self, user):
+        response = client_for(user).get(reverse("order-history") + "?status=X")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
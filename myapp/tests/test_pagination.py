@@ -0,0 +1,185 @@
+import pytest
+from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Book
+from myapp.pagination import KeysetPagination, count_rows, estimate_count
+from myapp.tests.factories import BookFactory, OrderFactory, PublisherFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    """Fixture to authenticate the client using a user factory."""
+    user = UserFactory()
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+@pytest.fixture
+def books():
+    """Books where several share a published date, so the id breaks ties."""
+    start = date(2020, 1, 1)
+    publisher = PublisherFactory()
+    return [BookFactory(published_date=start + timedelta(days=i // 3), publisher=publisher) for i in range(12)]
+
+
+def crawl(client, url):
+    """Follow `next` links until the last page, returning every page."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.data)
+        url = response.data["next"]
+    return pages
+
+
+def test_cursor_pagination_walks_every_book_once(auth_client, books):
+    """Keyset pages cover the catalogue in (published_date, id) order."""
+    pages = crawl(auth_client, reverse("book-list") + "?pagination=cursor&page_size=5")
+
+    ids = [book["id"] for page in pages for book in page["results"]]
+    expected = [book.id for book in sorted(books, key=lambda b: (b.published_date, b.id))]
+    assert ids == expected
+    assert [len(page["results"]) for page in pages] == [5, 5, 2]
+    assert pages[0]["previous"] is None
+    assert "count" not in pages[0]
+
+
+def test_cursor_pagination_previous_link(auth_client, books):
+    """The previous link returns the page that preceded the current one."""
+    first = auth_client.get(reverse("book-list") + "?pagination=cursor&page_size=4").data
+    second = auth_client.get(first["next"]).data
+    back = auth_client.get(second["previous"]).data
+
+    assert [book["id"] for book in back["results"]] == [book["id"] for book in first["results"]]
+    assert back["previous"] is None
+    assert back["next"] is not None
+
+
+def test_cursor_pagination_optional_count(auth_client, books):
+    """The total is only computed when requested."""
+    response = auth_client.get(reverse("book-list") + "?pagination=cursor&count=true")
+    assert response.status_code == 200
+    assert response.data["count"] == len(books)
+
+
+def test_cursor_pagination_invalid_cursor(auth_client, books):
+    """A tampered cursor is rejected."""
+    response = auth_client.get(reverse("book-list") + "?cursor=not-a-cursor")
+    assert response.status_code == 404
+
+
+def test_cursor_pagination_orders_newest_first(auth_client):
+    """Orders are paged newest first on (ordered_date, id)."""
+    orders = OrderFactory.create_batch(7)
+
+    pages = crawl(auth_client, reverse("order-list") + "?pagination=cursor&page_size=3")
+
+    ids = [order["id"] for page in pages for order in page["results"]]
+    assert ids == [order.id for order in sorted(orders, key=lambda o: (o.ordered_date, o.id), reverse=True)]
+
+
+def test_page_number_pagination_is_still_the_default(auth_client, books):
+    """Without a cursor the page-number response is unchanged."""
+    response = auth_client.get(reverse("book-list"))
+    assert response.status_code == 200
+    assert response.data["count"] == len(books)
+    assert len(response.data["results"]) == 5
+
+
+def page_queries(client, url):
+    """Return the SQL run to serve `url`."""
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(url).status_code == 200
+    return [query["sql"] for query in queries]
+
+
+def test_cursor_filter_bounds_the_leading_column(auth_client, books):
+    """Past the first page the leading key is range-bounded, not only OR-ed."""
+    first = auth_client.get(reverse("book-list") + "?pagination=cursor&page_size=4").data
+    assert any('"published_date" >= ' in sql for sql in page_queries(auth_client, first["next"]))
+
+
+def test_cursor_filter_bounds_descending_orders(auth_client):
+    """Newest-first order pages bound the leading key from above."""
+    OrderFactory.create_batch(5)
+    first = auth_client.get(reverse("order-list") + "?pagination=cursor&page_size=2").data
+    assert any('"ordered_date" <= ' in sql for sql in page_queries(auth_client, first["next"]))
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="checks the PostgreSQL plan")
+def test_cursor_filter_starts_an_index_range_scan(books):
+    """The cursor condition becomes an index condition, not a row filter."""
+    paginator = KeysetPagination()
+    paginator.ordering = ("published_date", "id")
+    paginator.fields = [Book._meta.get_field("published_date"), Book._meta.get_field("id")]
+    queryset = Book.objects.filter(
+        paginator.get_keyset_filter([books[6].published_date, books[6].id], reverse=False)
+    ).order_by("published_date", "id")[:5]
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    plan = queryset.explain()
+    assert "Index Cond" in plan and "published_date >=" in plan
+@pytest.fixture
+def estimates(settings, monkeypatch):
+    """Estimate past 3 rows, with a planner that always guesses 2 rows."""
+    settings.ESTIMATED_COUNT_THRESHOLD = 3
+    monkeypatch.setattr("myapp.pagination.ESTIMATE_VENDORS", (connection.vendor,))
+    monkeypatch.setattr("myapp.pagination.estimate_count", lambda queryset: 2)
+
+
+def test_count_is_exact_below_threshold(auth_client, books, settings):
+    settings.ESTIMATED_COUNT_THRESHOLD = 100
+    data = auth_client.get(reverse("book-list")).data
+    assert data["count"] == len(books)
+    assert data["count_approximate"] is False
+
+
+def test_count_is_exact_without_planner_statistics(auth_client, books, settings, monkeypatch):
+    settings.ESTIMATED_COUNT_THRESHOLD = 3
+    monkeypatch.setattr("myapp.pagination.ESTIMATE_VENDORS", ())
+    data = auth_client.get(reverse("book-list")).data
+    assert data["count"] == len(books)
+    assert data["count_approximate"] is False
+
+
+def test_estimated_count_pages_past_the_estimate(auth_client, books, estimates):
+    """An estimate below the real count does not hide the later pages."""
+    pages = crawl(auth_client, reverse("book-list") + "?page_size=5")
+
+    # never below what the bounded exact count saw
+    assert pages[0]["count"] == 4
+    assert all(page["count_approximate"] for page in pages)
+    assert [len(page["results"]) for page in pages] == [5, 5, 2]
+    assert auth_client.get(reverse("book-list") + "?page=4&page_size=5").status_code == 404
+
+
+def test_keyset_count_is_estimated(auth_client, books, estimates):
+    data = auth_client.get(reverse("book-list") + "?pagination=cursor&count=true").data
+    assert data["count"] == 4
+    assert data["count_approximate"] is True
+
+
+def test_admin_changelist_flags_estimated_count(admin_client, estimates):
+    OrderFactory.create_batch(5, status="P")
+    response = admin_client.get(reverse("admin:myapp_order_changelist"))
+    assert response.status_code == 200
+    assert response.context["cl"].paginator.approximate
+    assert "about 4 orders" in response.content.decode()
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="needs planner statistics")
+def test_planner_estimate(books):
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Book._meta.db_table}")
+    assert estimate_count(Book.objects.all()) == len(books)
+    assert count_rows(Book.objects.all(), threshold=3) == (len(books), True)
+    assert count_rows(Book.objects.all(), threshold=100) == (len(books), False)
@@ -0,0 +1,54 @@
+import io
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from myapp.models import Order, OrderItem
+from myapp.pricing import reprice_orders
+from myapp.tests.factories import BookFactory, OrderFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def orders():
+    cheap, dear = BookFactory(price=Decimal("2.50")), BookFactory(price=Decimal("10.00"))
+    first, second = OrderFactory(total_price=0, status="P"), OrderFactory(total_price=0, status="P")
+    empty = OrderFactory(total_price=5, status="P")
+    OrderItem.objects.create(order=first, book=cheap, quantity=3)
+    OrderItem.objects.create(order=first, book=dear, quantity=1)
+    OrderItem.objects.create(order=second, book=dear, quantity=2)
+    return cheap, dear, first, second, empty
+
+
+def totals():
+    return list(Order.objects.order_by("pk").values_list("total_price", flat=True))
+
+
+def test_calculate_total_price_is_one_aggregate(orders, django_assert_num_queries):
+    first = orders[2]
+    with django_assert_num_queries(2):  # aggregate and save
+        assert first.calculate_total_price() == Decimal("17.50")
+    first.refresh_from_db()
+    assert first.total_price == Decimal("17.50")
+
+
+def test_reprice_orders(orders, django_assert_max_num_queries):
+    with django_assert_max_num_queries(4):  # batch end, update, batch end, update
+        assert reprice_orders(batch_size=2) == 3
+    assert totals() == [Decimal("17.50"), Decimal("20.00"), Decimal("0.00")]
+
+    # Unchanged totals are left alone
+    assert reprice_orders() == 0
+
+
+def test_reprice_orders_command(orders):
+    cheap, dear, first, second, empty = orders
+    dear.price = Decimal("12.00")
+    dear.save()
+    Order.objects.filter(pk=second.pk).update(status="C")
+
+    stdout = io.StringIO()
+    call_command("reprice_orders", f"--book={dear.pk}", "--status=P", stdout=stdout)
+
+    assert "Repriced 1 orders." in stdout.getvalue()
+    assert totals() == [Decimal("19.50"), Decimal("0.00"), Decimal("5.00")]
@@ -0,0 +1,120 @@
+import io
+import pytest
+from importlib import import_module
+from django.apps import apps
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Book, Review
+from myapp.ratings import bayesian_score
+from myapp.tests.factories import BookFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+def review(book, rating):
+    return Review.objects.create(book=book, user=UserFactory(), review_text="Review", rating=rating)
+
+
+def aggregates(book):
+    book.refresh_from_db()
+    return (
+        book.rating_count, book.rating_sum,
+        [book.rating_count_1, book.rating_count_2, book.rating_count_3, book.rating_count_4, book.rating_count_5],
+    )
+
+
+def test_aggregates_follow_reviews(settings):
+    settings.RATING_PRIOR_WEIGHT, settings.RATING_PRIOR_MEAN = 2, 3.0
+    book, other = BookFactory(), BookFactory()
+    assert book.rating_score == 3.0
+
+    five, four = review(book, 5), review(book, 4)
+    assert aggregates(book) == (2, 9, [0, 0, 0, 1, 1])
+    assert book.rating_score == pytest.approx((2 * 3.0 + 9) / 4)
+
+    four.rating = 1
+    four.save()
+    assert aggregates(book) == (2, 6, [1, 0, 0, 0, 1])
+
+    five.book = other
+    five.save()
+    assert aggregates(book) == (1, 1, [1, 0, 0, 0, 0])
+    assert aggregates(other) == (1, 5, [0, 0, 0, 0, 1])
+
+    four.delete()
+    assert aggregates(book) == (0, 0, [0, 0, 0, 0, 0])
+    assert book.rating_score == pytest.approx(3.0)
+
+
+def test_review_write_is_one_book_update(django_assert_num_queries):
+    book, user = BookFactory(), UserFactory()
+    with django_assert_num_queries(2):  # insert, update
+        Review.objects.create(book=book, user=user, review_text="Review", rating=3)
+
+
+def test_reconcile_ratings(settings):
+    books = [BookFactory(), BookFactory(), BookFactory()]
+    for rating in (5, 5, 2):
+        review(books[0], rating)
+    review(books[1], 4)
+    Book.objects.filter(pk=books[0].pk).update(rating_count=0, rating_sum=0, rating_count_5=7)
+    settings.RATING_PRIOR_WEIGHT = 4
+
+    stdout = io.StringIO()
+    call_command("reconcile_ratings", "--batch-size=2", stdout=stdout)
+
+    # The first has wrong counts, the second a score from the old prior.
+    # The unreviewed one scores the prior mean either way.
+    assert "Fixed the ratings of 2 books." in stdout.getvalue()
+    assert aggregates(books[0]) == (3, 12, [0, 1, 0, 0, 2])
+    assert books[0].rating_score == pytest.approx(bayesian_score(12, 3))
+    call_command("reconcile_ratings", stdout=stdout)
+    assert "Fixed the ratings of 0 books." in stdout.getvalue()
+
+
+def test_migration_backfills_existing_reviews(settings):
+    """Books reviewed before the aggregates existed get them on migrate."""
+    books = [BookFactory(), BookFactory()]
+    for rating in (5, 1):
+        review(books[0], rating)
+    Book.objects.update(rating_count=0, rating_sum=0, rating_count_1=0, rating_count_5=0, rating_score=3.0)
+    settings.RATING_PRIOR_WEIGHT = 4
+
+    import_module("myapp.migrations.0019_book_ratings").backfill_ratings(apps, None)
+
+    assert aggregates(books[0]) == (2, 6, [1, 0, 0, 0, 1])
+    assert books[0].rating_score == pytest.approx(bayesian_score(6, 2))
+    assert aggregates(books[1]) == (0, 0, [0, 0, 0, 0, 0])
+
+
+def test_serializer_and_ordering(auth_client, settings):
+    settings.RATING_PRIOR_WEIGHT, settings.RATING_PRIOR_MEAN = 1, 3.0
+    loved, liked, unrated = BookFactory(), BookFactory(), BookFactory()
+    review(loved, 5)
+    review(loved, 5)
+    review(liked, 4)
+
+    response = auth_client.get(reverse("book-detail", args=[loved.id]))
+    assert response.data["rating"] == {
+        "count": 2, "average": 5.0, "score": pytest.approx(13 / 3, abs=0.001),
+        "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 2},
+    }
+    assert "rating_sum" not in response.data
+
+    response = auth_client.get(reverse("book-list") + "?ordering=-rating")
+    assert [book["id"] for book in response.data["results"]] == [loved.id, liked.id, unrated.id]
+
+    url = reverse("book-list") + "?ordering=rating&pagination=cursor&page_size=2"
+    first = auth_client.get(url).data
+    assert [book["id"] for book in first["results"]] == [unrated.id, liked.id]
+    second = auth_client.get(first["next"]).data
+    assert [book["id"] for book in second["results"]] == [loved.id]
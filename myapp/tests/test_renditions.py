@@ -0,0 +1,98 @@
+import io
+from unittest import mock
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Book
+from myapp.renditions import generate_renditions
+from myapp.tests.factories import BookFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(UserFactory()).access_token}")
+    return client
+
+
+def cover(width=1600, height=2400):
+    """A noisy JPEG, noise does not compress away like a flat colour."""
+    output = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(output, "JPEG", quality=95)
+    return SimpleUploadedFile("cover.jpg", output.getvalue(), content_type="image/jpeg")
+
+
+def test_generate_renditions(media_root):
+    book = BookFactory(cover_photo=cover())
+
+    renditions = generate_renditions(book)
+
+    original_size = book.cover_photo.size
+    for name, size in {"thumbnail": (160, 240), "card": (320, 480), "full": (800, 1200)}.items():
+        rendition = renditions[name]
+        assert (rendition["width"], rendition["height"]) == size
+        with Image.open(media_root / rendition["name"]) as image:
+            assert image.format == "WEBP"
+            assert image.size == size
+    assert (media_root / renditions["thumbnail"]["name"]).stat().st_size * 10 < original_size
+
+    book.refresh_from_db()
+    assert book.cover_renditions == renditions
+
+
+def test_small_covers_are_not_upscaled():
+    book = BookFactory(cover_photo=cover(120, 100))
+    renditions = generate_renditions(book)
+    assert (renditions["full"]["width"], renditions["full"]["height"]) == (120, 100)
+
+
+def test_identical_covers_share_files():
+    data = cover().read()
+    first = BookFactory(cover_photo=SimpleUploadedFile("a.jpg", data))
+    second = BookFactory(cover_photo=SimpleUploadedFile("b.jpg", data))
+    assert generate_renditions(first)["card"] == generate_renditions(second)["card"]
+
+
+def test_serializer_exposes_srcset(auth_client):
+    book = BookFactory(cover_photo=cover())
+    generate_renditions(book)
+
+    response = auth_client.get(reverse("book-detail", args=[book.id]))
+    renditions = response.data["cover_renditions"]
+    assert list(renditions) == ["thumbnail", "card", "full"]
+    assert renditions["thumbnail"]["url"].startswith("http://testserver/media/covers/renditions/")
+    assert response.data["cover_srcset"] == ", ".join(
+        f"{rendition['url']} {rendition['width']}w" for rendition in renditions.values()
+    )
+
+
+def test_renditions_are_scheduled_after_commit(django_capture_on_commit_callbacks):
+    dispatcher = mock.Mock()
+    with mock.patch("myapp.renditions.get_dispatcher", return_value=dispatcher):
+        with django_capture_on_commit_callbacks(execute=True):
+            book = BookFactory(cover_photo=cover(200, 300))
+        assert dispatcher.submit.call_args.args[1] == book.pk
+
+        generate_renditions(book)
+        dispatcher.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True):
+            book.title = "Renamed"
+            book.save()
+        dispatcher.submit.assert_not_called()
+
+
+def test_command_renders_missing():
+    books = [BookFactory(cover_photo=cover(200, 300)) for _ in range(3)]
+    generate_renditions(books[0])
+
+    stdout = io.StringIO()
+    call_command("generate_renditions", stdout=stdout)
+
+    assert "Rendered 2 covers" in stdout.getvalue()
+    assert all(book.cover_renditions["thumbnail"] for book in Book.objects.all())
@@ -0,0 +1,112 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.models import Book, BookSearchDocument
+from myapp.search import get_search_backend
+from myapp.tests.factories import AuthorFactory, BookFactory, GenreFactory, PublisherFactory, UserFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def auth_client():
+    """Fixture to authenticate the client using a user factory."""
+    user = UserFactory()
+    client = APIClient()
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    return client
+
+
+def make_book(title, **kwargs):
+    """A book whose searchable text is fully controlled by the test."""
+    kwargs.setdefault("description", "")
+    kwargs.setdefault("publisher", PublisherFactory(name=f"Press {title}"))
+    return BookFactory(title=title, **kwargs)
+
+
+def search(*terms):
+    return list(get_search_backend().search(Book.objects.all(), list(terms)))
+
+
+def test_document_covers_related_names():
+    """Author, publisher and genre names are searchable."""
+    book = make_book("Night Shift", publisher=PublisherFactory(name="Doubleday"))
+    book.authors.add(AuthorFactory(first_name="Stephen", last_name="King"))
+    book.genres.add(GenreFactory(name="Horror"))
+    make_book("Unrelated")
+
+    assert search("king") == [book]
+    assert search("doubleday") == [book]
+    assert search("horror") == [book]
+    assert search("stephen", "night") == [book]
+    assert search("stephen", "unrelated") == []
+
+
+def test_document_follows_related_changes():
+    """Renaming or removing related rows updates the document."""
+    author = AuthorFactory(first_name="Agatha", last_name="Christie")
+    genre = GenreFactory(name="Mystery")
+    book = make_book("Curtain")
+    book.authors.add(author)
+    book.genres.add(genre)
+
+    author.last_name = "Mallowan"
+    author.save()
+    assert search("mallowan") == [book]
+    assert search("christie") == []
+
+    book.genres.remove(genre)
+    assert search("mystery") == []
+
+    author.delete()
+    assert search("mallowan") == []
+
+
+def test_results_are_ranked():
+    """Title matches outrank description-only matches."""
+    in_description = make_book("Cooking", description="Not about dragons at all, dragons")
+    in_title = make_book("Dragons of Autumn", description="A fantasy story")
+
+    assert search("dragons") == [in_title, in_description]
+
+
+def test_prefix_and_syntax_are_safe():
+    """Partial words match and query syntax characters are ignored."""
+    book = make_book("Programming Django")
+
+    assert search("djan") == [book]
+    assert search('"djan*" -(') == [book]
+    assert search("()") == []
+
+
+def test_search_endpoint_uses_backend(auth_client):
+    """`?search=` is served by the full-text backend."""
+    book = make_book("The Shining")
+    book.authors.add(AuthorFactory(first_name="Stephen", last_name="King"))
+    make_book("Dune")
+
+    response = auth_client.get(reverse("book-list") + "?search=king")
+    assert response.status_code == 200
+    assert [result["id"] for result in response.data["results"]] == [book.id]
+
+
+def test_contains_backend(settings):
+    """The fallback backend matches on the same document."""
+    settings.BOOK_SEARCH_BACKEND = "myapp.search.ContainsSearchBackend"
+    book = make_book("Emma", publisher=PublisherFactory(name="John Murray"))
+    make_book("Persuasion")
+
+    assert search("murray") == [book]
+
+
+def test_rebuild_search_index():
+    """The rebuild command recreates missing documents."""
+    book = make_book("Middlemarch")
+    BookSearchDocument.objects.all().delete()
+    assert search("middlemarch") == []
+
+    call_command("rebuild_search_index")
+    assert search("middlemarch") == [book]
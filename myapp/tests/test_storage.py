@@ -0,0 +1,95 @@
+import hashlib
+import io
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from myapp.cache import get_versions
+from myapp.models import Book, MediaBlob
+from myapp.storage import cover_storage
+from myapp.tests.factories import BookFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_files_are_named_by_content(media_root):
+    content = b"cover bytes" * 10000
+    digest = hashlib.sha256(content).hexdigest()
+
+    name = cover_storage().save("covers/upload.JPG", ContentFile(content))
+
+    assert name == f"covers/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    assert (media_root / name).read_bytes() == content
+    # nothing is left behind in the flat directory
+    assert [path.name for path in (media_root / "covers").iterdir()] == [digest[:2]]
+
+
+def test_identical_uploads_are_stored_once(media_root):
+    storage = cover_storage()
+    first = storage.save("covers/a.jpg", ContentFile(b"same"))
+    second = storage.save("covers/b.jpg", ContentFile(b"same"))
+    other = storage.save("covers/c.jpg", ContentFile(b"different"))
+
+    assert first == second != other
+    assert MediaBlob.objects.get(name=first).refs == 2
+
+    storage.delete(first)
+    assert storage.exists(first)
+    storage.delete(second)
+    assert not storage.exists(first)
+    assert not MediaBlob.objects.filter(name=first).exists()
+    assert storage.exists(other)
+
+
+def test_untracked_files_are_not_deleted(media_root):
+    (media_root / "covers").mkdir(parents=True)
+    (media_root / "covers" / "legacy.jpg").write_bytes(b"old")
+    cover_storage().delete("covers/legacy.jpg")
+    assert (media_root / "covers" / "legacy.jpg").exists()
+
+
+def test_deleting_a_book_releases_its_cover(django_capture_on_commit_callbacks):
+    data = b"shared cover"
+    first = BookFactory(cover_photo=SimpleUploadedFile("a.jpg", data))
+    second = BookFactory(cover_photo=SimpleUploadedFile("b.jpg", data))
+    name = first.cover_photo.name
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    assert cover_storage().exists(name)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+    assert not cover_storage().exists(name)
+
+
+def test_replacing_a_cover_releases_the_old_one(django_capture_on_commit_callbacks):
+    book = BookFactory(cover_photo=SimpleUploadedFile("a.jpg", b"first"))
+    old_name = book.cover_photo.name
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book.cover_photo = SimpleUploadedFile("b.jpg", b"second")
+        book.save()
+    assert not cover_storage().exists(old_name)
+    assert cover_storage().exists(book.cover_photo.name)
+
+
+def test_shard_covers_command(media_root):
+    (media_root / "covers").mkdir(parents=True)
+    (media_root / "covers" / "legacy.jpg").write_bytes(b"legacy cover")
+    books = BookFactory.create_batch(2)
+    Book.objects.filter(pk__in=[book.pk for book in books]).update(cover_photo="covers/legacy.jpg")
+
+    version = get_versions([Book])[0]
+
+    stdout = io.StringIO()
+    call_command("shard_covers", stdout=stdout)
+
+    assert "Moved 2 covers (1 files)" in stdout.getvalue()
+    assert get_versions([Book])[0] > version
+    names = set(Book.objects.filter(pk__in=[book.pk for book in books]).values_list("cover_photo", flat=True))
+    assert len(names) == 1
+    name = names.pop()
+    assert MediaBlob.objects.get(name=name).refs == 2
+    assert (media_root / name).read_bytes() == b"legacy cover"
+    assert not (media_root / "covers" / "legacy.jpg").exists()
@@ -1,27 +1,49 @@
-import requests
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from .filters import BookFilter
-from rest_framework.filters import SearchFilter
+from .filters import BOOK_ORDERINGS, BookFilter, BookSearchFilter
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.parsers import MultiPartParser, FormParser
-from myapp.models import Book, Order, Genre, Author, Publisher, Review
-from myapp.serializers import BookSerializer, OrderSerializer,BookSummarySerializer, GenreSerializer, AuthorSerializer, PublisherSerializer, ReviewSerializer
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from myapp.bulk import create_books, existing_ids
+from myapp.cache import CachedResponseMixin
+from myapp.conditional import ConditionalGetMixin
+from myapp.exports import ExportMixin
+from myapp.facets import facet_counts, facet_signature
+from myapp.inventory import with_stock
+from myapp.leaderboards import WINDOWS as LEADERBOARD_WINDOWS, bestsellers, scope_for, top_rated
+from myapp.models import Book, BookGenre, Order, OrderItem, Genre, Author, Publisher, Review
+from myapp.openlibrary import OpenLibraryError, OpenLibraryUnavailable, extract_description, get_client
+from myapp.pagination import CustomPagination, PaginationModeMixin
+from myapp.querybudget import QueryBudgetMixin
+from myapp.streaming import STREAM_FORMATS, iter_chunks
+from myapp.serializers import BookSerializer, BookBulkItemSerializer, OrderSerializer, OrderHistorySerializer, BookSummarySerializer, GenreSerializer, AuthorSerializer, PublisherSerializer, ReviewSerializer
 
-class CustomPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = 'page_size'
-
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+class BookViewSet(ConditionalGetMixin, CachedResponseMixin, PaginationModeMixin, QueryBudgetMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = with_stock(Book.objects.select_related('publisher').prefetch_related('authors', 'genres'))
     serializer_class = BookSerializer
     parser_classes = (MultiPartParser, FormParser)
     pagination_class = CustomPagination
+    keyset_ordering = ('published_date', 'id')
     search_fields = ['title', 'description']
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, BookSearchFilter]
     filterset_class = BookFilter
+    # count (and a planner estimate past ESTIMATED_COUNT_THRESHOLD) + page +
+    # authors + genres, independent of the page size;
+    # retrieve also reads updated_at for Last-Modified
+    # leaderboards are one index range scan; facets four grouped queries
+    query_budgets = {'list': 5, 'retrieve': 4, 'top_rated': 1, 'bestsellers': 1, 'facets': 4}
+    summary_chunk_size = 500
+    export_name = 'books'
+    bulk_create_limit = 1000
+    leaderboard_limit = 10
+    leaderboard_max_limit = 100
+    cache_dependencies = (Book, Author, Publisher, Genre, BookGenre, Book.authors.through)
+
+    def get_keyset_ordering(self):
+        # Cursors follow ?ordering= when given
+        return BOOK_ORDERINGS.get(self.request.query_params.get('ordering'), self.keyset_ordering)
 
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
@@ -38,13 +60,131 @@ class BookViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-    # Custom action for book summary
+    # Custom action for book summary. `?stream=ndjson` or `?stream=json`
+    # streams the catalogue chunk by chunk instead of building one list.
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request):
-        books = Book.objects.all()
-        serializer = BookSummarySerializer(books, many=True)
-        return Response(serializer.data)
- 
+        # Same order whether streamed or not, iter_chunks walks by pk
+        books = Book.objects.select_related('publisher').order_by('pk')
+        stream = request.query_params.get('stream')
+        if stream is None:
+            serializer = BookSummarySerializer(books.prefetch_related('authors'), many=True)
+            return Response(serializer.data)
+
+        if stream not in STREAM_FORMATS:
+            return Response(
+                {"error": f"stream must be one of: {', '.join(STREAM_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        render, content_type = STREAM_FORMATS[stream]
+        chunks = iter_chunks(books, chunk_size=self.summary_chunk_size, prefetch=['authors'])
+
+        def serialize(chunk):
+            return BookSummarySerializer(chunk, many=True).data
+
+        return StreamingHttpResponse(render(chunks, serialize), content_type=content_type)
+
+    # Bulk create: a JSON array of books with author and genre ids. Valid
+    # books are created together, invalid ones are reported by index.
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser])
+    def bulk_create(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Expected a non-empty list of books."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_create_limit:
+            return Response(
+                {"error": f"At most {self.bulk_create_limit} books can be created per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        context = {**self.get_serializer_context(), **existing_ids(items)}
+        rows, indexes, errors = [], [], []
+        for index, item in enumerate(items):
+            serializer = BookBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                rows.append(serializer.validated_data)
+                indexes.append(index)
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+
+        books = create_books(rows) if rows else []
+        created = [{"index": index, "id": book.pk} for index, book in zip(indexes, books)]
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({"created": created, "errors": errors}, status=response_status)
+
+    # Counts per genre, publisher, price band and year of the books the list
+    # returns for the same filters and ?search=. Cached per filter signature,
+    # so pagination and ordering parameters do not matter.
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        return self.cached_response(self.facets_response, request)
+
+    def facets_response(self, request):
+        books = self.filter_queryset(Book.objects.all())
+        return Response(facet_counts(books))
+
+    def get_cache_signature(self, request):
+        if self.action == 'facets':
+            filterset = self.filterset_class(request.query_params, queryset=Book.objects.none(), request=request)
+            signature = facet_signature(filterset, BookSearchFilter().get_search_terms(request))
+            if signature is not None:
+                return signature
+        return super().get_cache_signature(request)
+
+    # Leaderboards, read from the rankings kept by `manage.py refresh_leaderboards`.
+    # `?genre=<id>` or `?publisher=<id>` narrow them, `?limit=` sets the length.
+    @action(detail=False, methods=['get'], url_path='top-rated')
+    def top_rated(self, request):
+        try:
+            scope, limit = self.leaderboard_params(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            {"rank": rank, "id": ranking.book_id, "title": ranking.book.title,
+             "score": round(ranking.rating_score, 3), "ratings": ranking.rating_count}
+            for rank, ranking in enumerate(top_rated(scope, limit), start=1)
+        ])
+
+    # `?days=7` (default) or `?days=30`, units ordered in that many days
+    @action(detail=False, methods=['get'], url_path='bestsellers')
+    def bestsellers(self, request):
+        try:
+            scope, limit = self.leaderboard_params(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        windows = {str(days): days for days in LEADERBOARD_WINDOWS}
+        days = windows.get(request.query_params.get('days', '7'))
+        if days is None:
+            return Response(
+                {"error": f"days must be one of: {', '.join(windows)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        field = LEADERBOARD_WINDOWS[days]
+        return Response([
+            {"rank": rank, "id": ranking.book_id, "title": ranking.book.title, "units": getattr(ranking, field)}
+            for rank, ranking in enumerate(bestsellers(scope, days, limit), start=1)
+        ])
+
+    def leaderboard_params(self, request):
+        params = request.query_params
+        try:
+            genre = int(params['genre']) if 'genre' in params else None
+            publisher = int(params['publisher']) if 'publisher' in params else None
+            limit = int(params.get('limit', self.leaderboard_limit))
+        except ValueError:
+            raise ValueError("genre, publisher and limit must be integers.")
+        if genre is not None and publisher is not None:
+            raise ValueError("Give either genre or publisher, not both.")
+        return scope_for(genre=genre, publisher=publisher), max(1, min(limit, self.leaderboard_max_limit))
+
     # Custom action to search books using the Open Library API
     @action(detail=False, methods=['get'], url_path='search-details')
     def search_details(self, request):
@@ -55,17 +195,15 @@ class BookViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        api_url = "https://openlibrary.org/search.json"
-        params = {
-            "q": query,
-            "fields": "key,title,author_name,editions,description",
-        }
         try:
-            response = requests.get(api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = get_client().search(query)
             return Response(data, status=status.HTTP_200_OK)
-        except requests.exceptions.RequestException as e:
+        except OpenLibraryUnavailable as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except OpenLibraryError as e:
             return Response(
                 {"error": str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -81,52 +219,82 @@ class BookViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
     
-        api_url = "https://openlibrary.org/search.json"
-        params = {
-            "q": book.title,
-            "fields": "key,title,author_name,editions,description",
-        }
-        
         try:
-            response = requests.get(api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-    
-            if data["docs"]:
-                description = data["docs"][0].get("editions", {}).get("docs", [{}])[0].get("description", "")
-                book.description = description
-                book.save()
-    
-                return Response({"message": "Description updated successfully."}, status=status.HTTP_200_OK)
-            else:
-                return Response({"error": "No matching details found from Open Library."}, status=status.HTTP_404_NOT_FOUND)
-        except requests.exceptions.RequestException as e:
+            data = get_client().search(book.title)
+        except OpenLibraryUnavailable as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        except OpenLibraryError as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        description = extract_description(data)
+        if description is None:
+            return Response({"error": "No matching details found from Open Library."}, status=status.HTTP_404_NOT_FOUND)
+
+        book.description = description
+        book.save()
+        return Response({"message": "Description updated successfully."}, status=status.HTTP_200_OK)
+
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, PaginationModeMixin, QueryBudgetMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     pagination_class = CustomPagination
+    keyset_ordering = ('-ordered_date', '-id')
+    cache_dependencies = (Order, OrderItem)
+    export_name = 'orders'
+    # count (and a planner estimate past ESTIMATED_COUNT_THRESHOLD) + page +
+    # items with their books, independent of the page size
+    query_budgets = {'history': 4}
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class GenreViewSet(viewsets.ModelViewSet):
+    # The requesting user's orders, newest first, with their items.
+    # `?status=P,C` (or repeated) narrows them down; backed by the
+    # (user, ordered_date, id) index.
+    @action(detail=False, methods=['get'], url_path='history')
+    def history(self, request):
+        orders = Order.objects.filter(user=request.user).order_by(*self.keyset_ordering).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('book').order_by('pk'))
+        )
+        statuses = [code for value in request.query_params.getlist('status') for code in value.split(',') if code]
+        if statuses:
+            valid = dict(Order.ORDER_STATUS_CHOICES)
+            unknown = [code for code in statuses if code not in valid]
+            if unknown:
+                return Response(
+                    {"error": f"Unknown status {', '.join(unknown)}, expected one of: {', '.join(valid)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            orders = orders.filter(status__in=statuses)
+
+        page = self.paginate_queryset(orders)
+        serializer = OrderHistorySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class GenreViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_dependencies = (Genre,)
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
+    cache_dependencies = (Author,)
 
-class PublisherViewSet(viewsets.ModelViewSet):
+class PublisherViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Publisher.objects.all()
     serializer_class = PublisherSerializer
+    cache_dependencies = (Publisher,)
     
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
-    serializer_class = ReviewSerializer
\ No newline at end of file
+    serializer_class = ReviewSerializer
+    cache_dependencies = (Review,)
+    export_name = 'reviews'